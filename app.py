@@ -1,25 +1,88 @@
+import time
+
+# Début du démarrage : le rapport de démarrage découpe le temps jusqu'au
+# premier layout en import, chargement des données et layout
+DEBUT_DEMARRAGE = time.perf_counter()
+
 import dash
 from dash import dcc, html
 import dash_bootstrap_components as dbc
-from dash.dependencies import Input, Output
+from dash.dependencies import Input, Output, State
 import pandas as pd
 from datetime import datetime, timedelta
-import plotly.express as px
+import logging
+import uuid
+
+import donnees
+import kpi
+import metriques
+import precalcul
+import taches
+from cache_rendu import CacheRendu, normaliser_filtres
+from figures import par_client
+from requete_table import filtrer
+
+# Chaque figure plotly express construite est chronométrée (/metrics) ;
+# plotly.express n'est importé qu'à la première figure
+px = metriques.chronometrer_figures('plotly.express')
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+logger = logging.getLogger(__name__)
+metriques.enregistrer_phase('import', time.perf_counter() - DEBUT_DEMARRAGE)
+
+# Les processus de lecture des extraits (forkserver, voir donnees._snapshots)
+# réimportent ce script sous le nom __mp_main__ : ils n'en gardent que les
+# définitions, sans chargement des données ni threads de surveillance.
+PROCESSUS_PRINCIPAL = __name__ != '__mp_main__'
+
+# Chargement des données (snapshot Parquet réutilisé tant que l'Excel ne change pas)
+# puis surveillance du fichier : un nouvel extrait est rechargé sans redémarrer.
+if PROCESSUS_PRINCIPAL:
+    with metriques.phase('chargement'):
+        donnees.initialiser(donnees.SOURCE)
+        donnees.surveiller(donnees.SOURCE)
+        # Fenêtres relatives au jour (échéances 3 mois, 30 jours) recalculées à minuit
+        # et après chaque rechargement, hors du chemin des requêtes
+        donnees.planifier_precalculs()
+
+# Cache des rendus d'onglets, vidé à chaque rechargement des données
+cache_onglets = CacheRendu()
+donnees.abonner(lambda jeu: cache_onglets.vider())
 
-# Chargement des données
-df = pd.read_excel('data/delegation0.xlsx', sheet_name='Sheet1')
-df.columns = df.columns.str.strip()
+# Setup Dash
+# suppress_callback_exceptions : le tableau des échéances n'existe que dans l'onglet général
+app = dash.Dash(__name__, external_stylesheets=[dbc.themes.FLATLY],
+                suppress_callback_exceptions=True)#QUARTZ  SKETCHY MINTY SOLAR
+server = app.server
+metriques.installer(server)
 
-# Conversion des dates
-for col in ['date de mise en place', 'date d echeance', 'date de saisie',
-            'date de derniere reevaluation', 'date de maturite de l engagement']:
-    df[col] = pd.to_datetime(df[col], dayfirst=True, errors='coerce')
+# Onglets lourds calculés en arrière-plan ; résultats en cache disque par
+# données chargées et date du jour (None sans diskcache : callback synchrone)
+gestionnaire_taches = taches.creer_gestionnaire(
+    lambda: donnees.jeu_courant().identifiant,
+    lambda: datetime.today().date().isoformat())
 
-df['duree_garantie'] = (df['date d echeance'] - df['date de mise en place']).dt.days
 
-# Setup Dash
-app = dash.Dash(__name__, external_stylesheets=[dbc.themes.FLATLY])#QUARTZ  SKETCHY MINTY SOLAR
-server = app.server
+@server.route('/cache-stats')
+def cache_stats():
+    return cache_onglets.stats()
+
+
+@server.route('/rejets')
+def rapport_rejets():
+    # Cellules rejetées ou corrigées au typage de chaque extrait
+    return donnees.rejets(donnees.SOURCE)
+
+
+def _metriques_cache():
+    stats = cache_onglets.stats()
+    return [('dash_cache_hits_total', 'counter', stats['hits']),
+            ('dash_cache_misses_total', 'counter', stats['misses']),
+            ('dash_cache_partages_total', 'counter', stats['partages']),
+            ('dash_cache_octets', 'gauge', stats['taille'])]
+
+
+metriques.ajouter_collecteur(_metriques_cache)
 
 
 from datetime import datetime, timedelta
@@ -30,55 +93,86 @@ from datetime import datetime, timedelta
 import pandas as pd
 import dash
 from dash import dash_table
-
-def create_echeance_table(dff):
-    today = datetime.today()
-
-    # Copie sécurisée et conversion des dates
-    dff = dff.copy()
-    dff['date d echeance'] = pd.to_datetime(dff['date d echeance'], errors='coerce')
-    dff['date de mise en place'] = pd.to_datetime(dff['date de mise en place'], errors='coerce')
-
-    # Filtrage des données dans les 3 mois
-    mask = (dff['date d echeance'] >= today) & (dff['date d echeance'] <= today + timedelta(days=90))
-    echeance_3mois = dff.loc[mask].copy()
-
-    if echeance_3mois.empty:
+from dash.dash_table.Format import Format, Group, Scheme, Symbol
+
+
+# Colonnes du tableau des échéances et leur libellé
+COLONNES_ECHEANCES = {
+    'nom client': 'Client',
+    'libelle nature': 'Type garantie',
+    'montant de la garantie': 'Montant',
+    'date de mise en place': 'Mise en place',
+    'date d echeance': 'Échéance',
+    'Jours restants': 'Jours restants',
+    'nom garant': 'Assureur'
+}
+COLONNES_DATES_ECHEANCES = ['Mise en place', 'Échéance']
+
+
+def echeances_3mois(sel):
+    # Garanties arrivant à échéance dans les 90 jours, valeurs brutes (non formatées)
+    cols = [c for c in COLONNES_ECHEANCES if c != 'Jours restants']
+    echeances = sel.lignes_fenetre('echeances_3mois')[cols]
+    echeances['Jours restants'] = (echeances['date d echeance'] - sel.jour).dt.days
+    return echeances.rename(columns=COLONNES_ECHEANCES)
+
+
+def filtrer_echeances(echeances, filter_query):
+    return filtrer(echeances, filter_query, COLONNES_DATES_ECHEANCES)
+
+
+def page_echeances(echeances, page_current, page_size, sort_by):
+    # Tri puis découpage côté serveur : seule la page affichée est formatée et envoyée
+    if sort_by:
+        echeances = echeances.sort_values(
+            [s['column_id'] for s in sort_by],
+            ascending=[s['direction'] == 'asc' for s in sort_by],
+            kind='stable')
+    else:
+        echeances = echeances.sort_values('Jours restants', kind='stable')
+
+    debut = page_current * page_size
+    page = echeances.iloc[debut:debut + page_size].copy()
+    for col in COLONNES_DATES_ECHEANCES:
+        page[col] = page[col].dt.strftime('%d/%m/%Y')
+
+    data = page.to_dict('records')
+    tooltips = [
+        {column: {'value': f"{value:,.2f} €" if column == 'Montant' and pd.notnull(value) else str(value),
+                  'type': 'markdown'}
+         for column, value in row.items()}
+        for row in data
+    ]
+    return data, tooltips
+
+
+def create_echeance_table(sel):
+    nb_echeances = sel.compter_fenetre('echeances_3mois')
+
+    if nb_echeances == 0:
         return dash_table.DataTable(
             data=[],
             columns=[{'name': 'Aucune échéance à venir', 'id': 'info'}],
             style_cell={'textAlign': 'center', 'fontStyle': 'italic'}
         )
 
-    # Calcul des jours restants
-    echeance_3mois['Jours restants'] = (echeance_3mois['date d echeance'] - today).dt.days
-    echeance_3mois = echeance_3mois.sort_values('Jours restants')
-
-    # Formatage des colonnes
-    echeance_3mois['date de mise en place'] = echeance_3mois['date de mise en place'].dt.strftime('%d/%m/%Y')
-    echeance_3mois['date d echeance'] = echeance_3mois['date d echeance'].dt.strftime('%d/%m/%Y')
-
-    if 'montant de la garantie' in echeance_3mois.columns:
-        echeance_3mois['montant de la garantie'] = echeance_3mois['montant de la garantie'].apply(
-            lambda x: f"{x:,.2f} €" if pd.notnull(x) else ""
-        )
-
-    # Colonnes à afficher et leur mapping
-    cols_to_display = {
-        'nom client': 'Client',
-        'libelle nature': 'Type garantie',
-        'montant de la garantie': 'Montant',
-        'date de mise en place': 'Mise en place',
-        'date d echeance': 'Échéance',
-        'Jours restants': 'Jours restants',
-        'nom garant': 'Assureur'
-    }
-
-    df_final = echeance_3mois.rename(columns=cols_to_display)
+    # Les données sont servies page par page par update_echeance_table
+    colonnes = []
+    for v in COLONNES_ECHEANCES.values():
+        if v == 'Montant':
+            colonnes.append({'name': v, 'id': v, 'type': 'numeric',
+                             'format': Format(precision=2, scheme=Scheme.fixed, group=Group.yes,
+                                              symbol=Symbol.yes, symbol_suffix=' €')})
+        elif v == 'Jours restants':
+            colonnes.append({'name': v, 'id': v, 'type': 'numeric'})
+        else:
+            colonnes.append({'name': v, 'id': v})
 
     return dash_table.DataTable(
-        data=df_final.to_dict('records'),
-        columns=[{'name': v, 'id': v} for v in cols_to_display.values()],
+        id='table-echeances',
+        data=[],
+        columns=colonnes,
+        page_count=-(-nb_echeances // 10),
         
         style_table={
             'overflowX': 'auto',
@@ -153,18 +247,15 @@ def create_echeance_table(dff):
             }
         ],
         
+        page_current=0,
         page_size=10,
-        filter_action='native',
-        sort_action='native',
+        filter_action='custom',
+        filter_query='',
+        sort_action='custom',
         sort_mode='multi',
-        page_action='native',
+        sort_by=[],
+        page_action='custom',
         
-        tooltip_data=[
-            {
-                column: {'value': str(value), 'type': 'markdown'}
-                for column, value in row.items()
-            } for row in df_final.to_dict('records')
-        ],
         tooltip_duration=None,
         
         style_cell_conditional=[
@@ -181,159 +272,305 @@ def create_echeance_table(dff):
 
 
 
-def render_general_tab(dff):
-    today = datetime.today()
-    
+# La vue générale est découpée en sections indépendantes : chacune a son propre
+# callback, calculé en parallèle par les threads du serveur, et s'affiche dès
+# qu'elle est prête au lieu d'attendre la plus lente.
+def section_indicateurs(sel):
     # Calcul des indicateurs principaux
-    clients = dff['code client'].nunique()
-    total = len(dff)
-    actives = len(dff[dff['situationde la garantie'] == 'Active'])
-    expires = len(dff[dff['situationde la garantie'] == 'Expirée'])
-    resilies = len(dff[dff['situationde la garantie'] == 'Résiliée'])
-    
+    ind = kpi.depuis_selection(sel)
+    clients = ind.clients
+    total = ind.total
+    actives = ind.actives
+    expires = ind.expirees
+    resilies = ind.resiliees
+
+    return dbc.Row([
+        dbc.Col(dbc.Card([dbc.CardHeader("Clients distincts"), dbc.CardBody(html.H4(clients))]), md=2),
+        dbc.Col(dbc.Card([dbc.CardHeader("Total garanties"), dbc.CardBody(html.H4(total))]), md=3),
+        dbc.Col(dbc.Card([dbc.CardHeader("Garanties actives"), dbc.CardBody(html.H4(actives))]), md=3),
+        dbc.Col(dbc.Card([dbc.CardHeader("Garanties expirées"), dbc.CardBody(html.H4(expires))]), md=2),
+        dbc.Col(dbc.Card([dbc.CardHeader("Garanties resiliées"), dbc.CardBody(html.H4(resilies))]), md=2),
+    ], className="mb-4")
+
+
+def section_repartitions(sel):
+    # Création des graphiques (répartitions lues dans le cube)
+    fig_type = px.pie(sel.vue.par('libelle nature'), names='libelle nature', values='nb',
+                      title='Répartition par type de garantie')
+    fig_seg = px.pie(sel.vue.par('libelle segment'), names='libelle segment', values='nb',
+                     title='Répartition par segment')
+
+    return dbc.Row([
+        dbc.Col(dcc.Graph(figure=fig_type), md=6),
+        dbc.Col(dcc.Graph(figure=fig_seg), md=6),
+    ], className="mb-4")
+
+
+def section_montants(sel):
     # Calcul des montants
-    mt_total_val = dff['montant de la garantie'].sum()
-    mt_total = f"{mt_total_val:,.2f} €"
-    mt_mean = f"{dff['montant de la garantie'].mean():,.2f} €"
-    eng_val = dff['montant engagement couvert actualisé'].sum()
-    mt_eng = f"{eng_val:,.2f} €"
-    ratio = mt_total_val / eng_val if eng_val > 0 else 0
-    ratio_str = f"{ratio:.2%}"
-    
-    # Calcul des indicateurs temporels
-    echeance3 = len(dff[(dff['date d echeance'] >= today) & (dff['date d echeance'] <= today + timedelta(days=90))])
-    renouv = len(dff[dff['date de mise en place'] >= today - timedelta(days=30)])
-    duree = f"{dff['duree_garantie'].mean():.0f} j"
-    delai = f"{(dff['date de mise en place'] - dff['date de saisie']).dt.days.mean():.0f} j"
-    
-    # Création des graphiques
-    fig_type = px.pie(dff, names='libelle nature', title='Répartition par type de garantie')
-    fig_seg = px.pie(dff, names='libelle segment', title='Répartition par segment')
-    
+    ind = kpi.depuis_selection(sel)
+    mt_total = f"{ind.mt_total:,.2f} €"
+    mt_mean = f"{ind.mt_moyen:,.2f} €"
+    mt_eng = f"{ind.eng_total:,.2f} €"
+    ratio_str = f"{ind.ratio:.2%}"
+
+    return dbc.Row([
+        dbc.Col(dbc.Card([dbc.CardHeader("Montant total garanties"), dbc.CardBody(html.H5(mt_total))]), md=3),
+        dbc.Col(dbc.Card([dbc.CardHeader("Montant moyen"), dbc.CardBody(html.H5(mt_mean))]), md=3),
+        dbc.Col(dbc.Card([dbc.CardHeader("Engagements couverts"), dbc.CardBody(html.H5(mt_eng))]), md=3),
+        dbc.Col(dbc.Card([dbc.CardHeader("Ratio garantie / engagement"), dbc.CardBody(html.H5(ratio_str))]), md=3),
+    ], className="mb-4")
+
+
+def section_top_montants(sel):
     fig_top10 = px.bar(
-        dff.nlargest(10, 'montant de la garantie'),
+        sel.dff.nlargest(10, 'montant de la garantie'),
         x='nom client', y='montant de la garantie', 
         title="Top 10 garanties par montant",
         height=400
     )
-    
-    bins = [0, 1e6, 5e6, float('inf')]
-    labels = ['<1M', '1-5M', '>5M']
-    dff['tranche'] = pd.cut(dff['montant de la garantie'], bins=bins, labels=labels)
-    fig_dist = px.pie(dff, names='tranche', title='Répartition par montant')
-    
-    hist = dff.groupby(dff['date de mise en place'].dt.to_period('M')).size().reset_index(name='count')
-    hist['date'] = hist['date de mise en place'].astype(str)
+    fig_dist = px.pie(sel.vue.par('tranche'), names='tranche', values='nb', title='Répartition par montant')
+
+    return dbc.Row([
+        dbc.Col(dcc.Graph(figure=fig_top10), md=6),
+        dbc.Col(dcc.Graph(figure=fig_dist), md=6),
+    ], className="mb-4")
+
+
+def section_top_clients(sel):
+    top_nb = sel.top_clients('nb')
+    top_montant = sel.top_clients('montant')
+    # Barres horizontales, le premier client en haut
+    fig_nb = px.bar(top_nb, x='nb', y='nom client', orientation='h',
+                    title="Top 10 clients par nombre de garanties", height=400)
+    fig_nb.update_yaxes(autorange='reversed')
+    fig_montant = px.bar(top_montant, x='montant', y='nom client', orientation='h',
+                         title="Top 10 clients par montant garanti", height=400)
+    fig_montant.update_yaxes(autorange='reversed')
+
+    return dbc.Row([
+        dbc.Col(dcc.Graph(figure=fig_nb), md=6),
+        dbc.Col(dcc.Graph(figure=fig_montant), md=6),
+    ], className="mb-4")
+
+
+def section_historique(sel):
+    hist = sel.vue.par('mois mise en place').rename(columns={'nb': 'count'})
+    hist['date'] = hist['mois mise en place'].astype(str)
     fig_hist = px.line(hist, x='date', y='count', title="Historique des mises en place")
-    
-    ech = dff.groupby(dff['date d echeance'].dt.to_period('M')).size().reset_index(name='count')
-    ech['date'] = ech['date d echeance'].astype(str)
+
+    ech = sel.vue.par('mois echeance').rename(columns={'nb': 'count'})
+    ech['date'] = ech['mois echeance'].astype(str)
     fig_ech = px.bar(ech, x='date', y='count', title="Échéances par mois")
-    
-    # Création du tableau des échéances
-    echeance_table = create_echeance_table(dff)
-    
-    return html.Div([
-        dbc.Row([
-            dbc.Col(dbc.Card([dbc.CardHeader("Clients distincts"), dbc.CardBody(html.H4(clients))]), md=2),
-            dbc.Col(dbc.Card([dbc.CardHeader("Total garanties"), dbc.CardBody(html.H4(total))]), md=3),
-            dbc.Col(dbc.Card([dbc.CardHeader("Garanties actives"), dbc.CardBody(html.H4(actives))]), md=3),
-            dbc.Col(dbc.Card([dbc.CardHeader("Garanties expirées"), dbc.CardBody(html.H4(expires))]), md=2),
-            dbc.Col(dbc.Card([dbc.CardHeader("Garanties resiliées"), dbc.CardBody(html.H4(resilies))]), md=2),
-        ], className="mb-4"),
 
-        dbc.Row([
-            dbc.Col(dcc.Graph(figure=fig_type), md=6),
-            dbc.Col(dcc.Graph(figure=fig_seg), md=6),
-        ], className="mb-4"),
+    return dbc.Row([
+        dbc.Col(dcc.Graph(figure=fig_hist), md=6),
+        dbc.Col(dcc.Graph(figure=fig_ech), md=6)
+    ], className="mb-4")
 
-        dbc.Row([
-            dbc.Col(dbc.Card([dbc.CardHeader("Montant total garanties"), dbc.CardBody(html.H5(mt_total))]), md=3),
-            dbc.Col(dbc.Card([dbc.CardHeader("Montant moyen"), dbc.CardBody(html.H5(mt_mean))]), md=3),
-            dbc.Col(dbc.Card([dbc.CardHeader("Engagements couverts"), dbc.CardBody(html.H5(mt_eng))]), md=3),
-            dbc.Col(dbc.Card([dbc.CardHeader("Ratio garantie / engagement"), dbc.CardBody(html.H5(ratio_str))]), md=3),
-        ], className="mb-4"),
 
-        dbc.Row([
-            dbc.Col(dcc.Graph(figure=fig_top10), md=6),
-            dbc.Col(dcc.Graph(figure=fig_dist), md=6),
-        ], className="mb-4"),
+def section_temporels(sel):
+    # Calcul des indicateurs temporels
+    ind = kpi.depuis_selection(sel)
+    echeance3 = ind.echeances_3mois
+    renouv = ind.renouvellements_30j
+    duree = f"{ind.duree_moyenne:.0f} j"
+    delai = f"{ind.delai_moyen:.0f} j"
 
-        dbc.Row([
-            dbc.Col(dcc.Graph(figure=fig_hist), md=6),
-            dbc.Col(dcc.Graph(figure=fig_ech), md=6)
-        ], className="mb-4"),
+    return dbc.Row([
+        dbc.Col(dbc.Card([dbc.CardHeader("Échéance 3 mois"), dbc.CardBody(html.H5(echeance3))]), md=3),
+        dbc.Col(dbc.Card([dbc.CardHeader("Renouvellements 30j"), dbc.CardBody(html.H5(renouv))]), md=3),
+        dbc.Col(dbc.Card([dbc.CardHeader("Durée moyenne"), dbc.CardBody(html.H5(duree))]), md=3),
+        dbc.Col(dbc.Card([dbc.CardHeader("Délai saisie→mise en place"), dbc.CardBody(html.H5(delai))]), md=3),
+    ], className="mb-4")
+
+
+def section_actives(sel):
+    # Garanties en cours de validité au jour d'observation, et leur évolution
+    # jour par jour lue dans l'index des périodes (deux ans avant, un an après)
+    au = sel.jour.strftime('%d/%m/%Y')
+    nb, montant = sel.actives_au()
+    courbe = sel.intervalles.courbe(sel.jour - pd.DateOffset(years=2), sel.jour + pd.DateOffset(years=1))
+    fig_nb = px.line(courbe, x='date', y='nb', title="Garanties actives par jour",
+                     labels={'date': 'Date', 'nb': 'Garanties actives'})
+    fig_mt = px.line(courbe, x='date', y='montant', title="Montant garanti actif par jour",
+                     labels={'date': 'Date', 'montant': 'Montant (€)'})
+    for fig in (fig_nb, fig_mt):
+        fig.add_vline(x=sel.jour, line_dash='dash', line_color='grey')
 
-        dbc.Row([
-            dbc.Col(dbc.Card([dbc.CardHeader("Échéance 3 mois"), dbc.CardBody(html.H5(echeance3))]), md=3),
-            dbc.Col(dbc.Card([dbc.CardHeader("Renouvellements 30j"), dbc.CardBody(html.H5(renouv))]), md=3),
-            dbc.Col(dbc.Card([dbc.CardHeader("Durée moyenne"), dbc.CardBody(html.H5(duree))]), md=3),
-            dbc.Col(dbc.Card([dbc.CardHeader("Délai saisie→mise en place"), dbc.CardBody(html.H5(delai))]), md=3),
-        ], className="mb-4"),
-        
-        # Nouvelle section pour le tableau des échéances
-        dbc.Row([
-            dbc.Col(html.H4("Détail des échéances dans 3 mois", className="mt-4"), width=12),
-            dbc.Col(echeance_table, width=12)
-        ], className="mb-4"),
+    return dbc.Row([
+        dbc.Col(dbc.Card([dbc.CardHeader(f"Garanties actives au {au}"), dbc.CardBody(html.H5(nb))]), md=6),
+        dbc.Col(dbc.Card([dbc.CardHeader(f"Montant actif au {au}"),
+                          dbc.CardBody(html.H5(f"{montant:,.2f} €"))]), md=6),
+        dbc.Col(dcc.Graph(figure=fig_nb), md=6),
+        dbc.Col(dcc.Graph(figure=fig_mt), md=6),
+    ], className="mb-4")
+
+
+def _nb_alerte(sel, nom):
+    lignes = sel.alerte(nom)
+    return None if lignes is None else len(lignes)
+
+
+def section_alertes(sel):
+    # Alertes lues dans les positions précalculées (index clients), restreintes
+    # aux filtres : coût proportionnel au nombre de garanties concernées
+    renouvellement = _nb_alerte(sel, 'en_renouvellement')
+    non_renouvelees = _nb_alerte(sel, 'expirees_non_renouvelees')
+    defaut = _nb_alerte(sel, 'engagements_defaut')
+    en_cours = sum(n for n in (renouvellement, non_renouvelees, defaut) if n is not None)
+
+    fig_garanties = px.pie(sel.vue.par('situationde la garantie'), names='situationde la garantie',
+                           values='nb', title='Situation des garanties')
+    echus = sel.compter_fenetre('engagements_echus')
+    engagements = pd.DataFrame({'situation': ['En cours', 'Échu'],
+                                'nb': [sel.compter('date de maturite de l engagement') - echus, echus]})
+    fig_engagements = px.pie(engagements, names='situation', values='nb', title='Situation des engagements')
 
-        dbc.Row(dbc.Col(html.Footer("© 2025 Dashboard Assurance", className="text-center mt-4")))
-    ])
+    return dbc.Row([
+        dbc.Col(html.H4("Alertes et risques", className="mt-4"), width=12),
+        dbc.Col(dbc.Card([dbc.CardHeader("Alertes en cours"), dbc.CardBody(html.H5(en_cours))]), md=3),
+        dbc.Col(dbc.Card([dbc.CardHeader("En renouvellement"), dbc.CardBody(html.H5(renouvellement))]), md=3),
+        dbc.Col(dbc.Card([dbc.CardHeader("Expirées non renouvelées"), dbc.CardBody(html.H5(non_renouvelees))]), md=3),
+        dbc.Col(dbc.Card([dbc.CardHeader("Engagements en défaut"),
+                          dbc.CardBody(html.H5("n/d" if defaut is None else defaut))]), md=3),
+        dbc.Col(dcc.Graph(figure=fig_garanties), md=6),
+        dbc.Col(dcc.Graph(figure=fig_engagements), md=6),
+    ], className="mb-4")
+
+
+def section_echeances(sel):
+    # Section pour le tableau des échéances
+    return dbc.Row([
+        dbc.Col(html.H4("Détail des échéances dans 3 mois", className="mt-4"), width=12),
+        dbc.Col(create_echeance_table(sel), width=12)
+    ], className="mb-4")
+
+
+SECTIONS_GENERAL = {
+    'gen-indicateurs': section_indicateurs,
+    'gen-repartitions': section_repartitions,
+    'gen-montants': section_montants,
+    'gen-top-montants': section_top_montants,
+    'gen-top-clients': section_top_clients,
+    'gen-historique': section_historique,
+    'gen-temporels': section_temporels,
+    'gen-actives': section_actives,
+    'gen-alertes': section_alertes,
+    'gen-echeances': section_echeances,
+}
+
+
+def render_general_tab():
+    # Squelette de l'onglet : le contenu de chaque section arrive par son callback
+    return html.Div(
+        [dcc.Loading(html.Div(id=section_id), type='dot') for section_id in SECTIONS_GENERAL] +
+        [dbc.Row(dbc.Col(html.Footer("© 2025 Dashboard Assurance", className="text-center mt-4")))]
+    )
 
 
-def render_financier_tab(dff):
-    mt_total_val = dff['montant de la garantie'].sum()
-    mt_total = f"{mt_total_val:,.2f} €"
-    mt_mean = f"{dff['montant de la garantie'].mean():,.2f} €"
-    eng_val = dff['montant engagement couvert actualisé'].sum()
-    mt_eng = f"{eng_val:,.2f} €"
-    ratio = mt_total_val / eng_val if eng_val > 0 else 0
-    ratio_str = f"{ratio:.2%}"
+def render_financier_tab(sel):
+    ind = kpi.depuis_selection(sel)
+    mt_total = f"{ind.mt_total:,.2f} €"
+    mt_mean = f"{ind.mt_moyen:,.2f} €"
+    mt_eng = f"{ind.eng_total:,.2f} €"
+    ratio_str = f"{ind.ratio:.2%}"
+    au = sel.jour.strftime('%d/%m/%Y')
+    nb_actives, mt_actif = sel.actives_au()
 
     return dbc.Row([
         dbc.Col(dbc.Card([dbc.CardHeader("Montant total garanties"), dbc.CardBody(html.H4(mt_total))]), md=3),
         dbc.Col(dbc.Card([dbc.CardHeader("Montant moyen par garantie"), dbc.CardBody(html.H4(mt_mean))]), md=3),
         dbc.Col(dbc.Card([dbc.CardHeader("Montant engagements couverts"), dbc.CardBody(html.H4(mt_eng))]), md=3),
         dbc.Col(dbc.Card([dbc.CardHeader("Ratio garantie / engagement"), dbc.CardBody(html.H4(ratio_str))]), md=3),
+        dbc.Col(dbc.Card([dbc.CardHeader(f"Garanties actives au {au}"), dbc.CardBody(html.H4(nb_actives))]),
+                md=6, className="mt-3"),
+        dbc.Col(dbc.Card([dbc.CardHeader(f"Montant garanti actif au {au}"),
+                          dbc.CardBody(html.H4(f"{mt_actif:,.2f} €"))]), md=6, className="mt-3"),
     ])
 
-def render_partenaire_tab(dff):
-    # Montant total garanti par assureur
-    mt_par_assureur = dff.groupby('nom garant')['montant de la garantie'].sum().reset_index()
-    nbr_garantie = dff.groupby('nom garant').size().reset_index(name='nbr_garantie')
+def render_partenaire_tab(sel):
+    # Nombre et montant par assureur lus dans les résumés des partitions
+    par_assureur = sel.resume_garants()
+    mt_par_assureur = par_assureur['montant'].rename('montant de la garantie').reset_index()
+    nbr_garantie = par_assureur['nb'].rename('nbr_garantie').reset_index()
 
     # Taux de renouvellement par assureur (nombre garanties mises en place dernièrement / total garanties)
-    today = datetime.today()
-    dernier_30j = dff[dff['date de mise en place'] >= today - timedelta(days=30)]
-    renouv_par_assureur = dernier_30j.groupby('nom garant').size().reset_index(name='renouvellements')
-    total_par_assureur = dff.groupby('nom garant').size().reset_index(name='total_garanties')
-
-    taux_renouv = renouv_par_assureur.merge(total_par_assureur, on='nom garant', how='left')
-    taux_renouv['tx_renouvellement'] = taux_renouv['renouvellements'] / taux_renouv['total_garanties']
+    renouvellements = sel.par_garant_fenetre('renouvellements_30j')['nb']
+    renouvellements.index = renouvellements.index.astype(str)
+    taux_renouv = (renouvellements / par_assureur['nb'].reindex(renouvellements.index)).rename(
+        'tx_renouvellement').rename_axis('nom garant').reset_index()
 
     fig_mt = px.bar(mt_par_assureur, x='nom garant', y='montant de la garantie', title="Montant total garanti par assureur")
     fig_nbr = px.bar(nbr_garantie, x='nom garant', y='nbr_garantie', title="Nombre de garanties par assureur")
     fig_tx = px.bar(taux_renouv, x='nom garant', y='tx_renouvellement', title="Taux de renouvellement par assureur")
 
-    return dbc.Row([
-        dbc.Col(dcc.Graph(figure=fig_mt), md=4),
-        dbc.Col(dcc.Graph(figure=fig_nbr), md=4),
-        dbc.Col(dcc.Graph(figure=fig_tx), md=4),
+    # Un clic sur une barre ouvre le détail de l'assureur (callback afficher_detail_assureur)
+    return html.Div([
+        dbc.Row([
+            dbc.Col(dcc.Graph(id='graph-assureur-montant', figure=fig_mt), md=4),
+            dbc.Col(dcc.Graph(id='graph-assureur-nb', figure=fig_nbr), md=4),
+            dbc.Col(dcc.Graph(id='graph-assureur-taux', figure=fig_tx), md=4),
+        ]),
+        dcc.Loading(html.Div(html.P("Cliquez sur un assureur pour afficher son détail.",
+                                    className="text-muted text-center"),
+                             id='detail-assureur', className="mt-4"), type='dot'),
     ])
 
-def render_reevaluation_tab(dff):
-    today = datetime.today()
-    reevalues_30j = dff[dff['date de derniere reevaluation'] >= today - timedelta(days=30)]
+
+def render_detail_assureur(sel, garant):
+    # Détail d'un assureur : uniquement les lignes de sa partition
+    dff = sel.jeu.df.iloc[sel.lignes_garant(garant)]
+    ind = kpi.calculer(dff, sel.jour)
+    echeances = sel.jeu.df.iloc[sel.fenetre_garant('echeances_3mois', garant)]
+    reevaluations = sel.jeu.df.iloc[sel.fenetre_garant('reevaluations_30j', garant)]
+
+    def tableau(lignes, colonne_date, vide):
+        if lignes.empty:
+            return html.P(vide, className="text-muted")
+        lignes = lignes.sort_values(colonne_date, kind='stable')
+        data = pd.DataFrame({
+            'Client': lignes['nom client'].astype(str),
+            'Type garantie': lignes['libelle nature'].astype(str),
+            'Montant': lignes['montant de la garantie'].map('{:,.2f} €'.format),
+            'Date': lignes[colonne_date].dt.strftime('%d/%m/%Y'),
+        }).to_dict('records')
+        return dash_table.DataTable(data=data, columns=[{'name': c, 'id': c} for c in data[0]],
+                                    page_size=10, style_table={'overflowX': 'auto'})
+
+    return html.Div([
+        html.H4(f"Détail : {garant}", className="mt-2"),
+        dbc.Row([
+            dbc.Col(dbc.Card([dbc.CardHeader("Garanties"), dbc.CardBody(html.H5(ind.total))]), md=2),
+            dbc.Col(dbc.Card([dbc.CardHeader("Actives"), dbc.CardBody(html.H5(ind.actives))]), md=2),
+            dbc.Col(dbc.Card([dbc.CardHeader("Clients"), dbc.CardBody(html.H5(ind.clients))]), md=2),
+            dbc.Col(dbc.Card([dbc.CardHeader("Montant total"),
+                              dbc.CardBody(html.H5(f"{ind.mt_total:,.2f} €"))]), md=3),
+            dbc.Col(dbc.Card([dbc.CardHeader("Ratio garantie / engagement"),
+                              dbc.CardBody(html.H5(f"{ind.ratio:.2%}"))]), md=3),
+        ], className="mb-4"),
+        dbc.Row([
+            dbc.Col([html.H5(f"Échéances dans 3 mois ({len(echeances)})"),
+                     tableau(echeances, 'date d echeance', "Aucune échéance à venir")], md=6),
+            dbc.Col([html.H5(f"Réévaluations 30 jours ({len(reevaluations)})"),
+                     tableau(reevaluations, 'date de derniere reevaluation', "Aucune réévaluation récente")], md=6),
+        ]),
+    ])
+
+
+def render_reevaluation_tab(sel):
+    reevalues_30j = sel.lignes_fenetre('reevaluations_30j')
     nb_reevalues = len(reevalues_30j)
     mt_reevalues = reevalues_30j['montant de la garantie'].sum()
 
-    fig_nb = px.histogram(reevalues_30j, x='nom client', title="Nombre de réévaluations (30 derniers jours)", 
-                          labels={'nom client': 'Client'}, nbins=20)
+    # Agrégats par client côté serveur (top clients + "Autres")
+    nb_par_client, mt_par_client = par_client(reevalues_30j)
+    fig_nb = px.bar(nb_par_client, x='nom client', y='nb', title="Nombre de réévaluations (30 derniers jours)",
+                    labels={'nom client': 'Client', 'nb': 'Nombre'})
     
-    fig_mt = px.histogram(reevalues_30j, x='nom client', y='montant de la garantie', 
-                          title="Montant des garanties réévaluées", 
-                          labels={'montant de la garantie': 'Montant (€)', 'nom client': 'Client'}, 
-                          histfunc='sum')
+    fig_mt = px.bar(mt_par_client, x='nom client', y='montant',
+                    title="Montant des garanties réévaluées", 
+                    labels={'montant': 'Montant (€)', 'nom client': 'Client'})
 
     return html.Div([
         html.H4("Réévaluations récentes", className="mt-4"),
@@ -355,57 +592,231 @@ def render_reevaluation_tab(dff):
 
 
 # Callback d'affichage des tabs avec filtres
-@app.callback(
-    Output('tab-content', 'children'),
+ENTREES_ONGLET = [
     Input('tabs', 'active_tab'),
     Input('filter-type', 'value'),
     Input('filter-assureur', 'value'),
     Input('filter-year', 'value'),
+    Input('filter-date', 'date'),
+]
+
+
+@metriques.instrumenter_callback('render_tab_content')
+def render_tab_content(active_tab, type_filter, assur_filter, year_filter, date_reference=None):
+    jeu = donnees.jeu_courant()
+    jour = precalcul.jour_reference(date_reference)
+    cle = (active_tab, normaliser_filtres(type_filter, assur_filter, year_filter), jour, jeu.version)
+    return cache_onglets.obtenir(
+        cle, lambda: render_onglet(jeu, active_tab, type_filter, assur_filter, year_filter, jour))
+
+
+def render_onglet(jeu, active_tab, type_filter, assur_filter, year_filter, jour=None, progression=None):
+    # Filtrage par masques précalculés (pas de copie ni de scan isin par clic)
+    if progression:
+        progression(10, "Filtrage")
+    sel = jeu.selection(type_filter, assur_filter, year_filter, jour)
+    metriques.observer('dash_lignes_filtrees', sel.nb_lignes, callback='render_tab_content')
+
+    if progression:
+        progression(40, "Calcul de l'onglet")
+    with metriques.chronometre('dash_section_secondes', section=str(active_tab)):
+        if active_tab == "tab-general":
+            return render_general_tab()
+        elif active_tab == "tab-financier":
+            return render_financier_tab(sel)
+        elif active_tab == "tab-partenaire":
+            return render_partenaire_tab(sel)
+        elif active_tab == "tab-reevaluation":
+            return render_reevaluation_tab(sel)
+        return html.Div("Sélectionnez un onglet.")
+
+
+if gestionnaire_taches is None:
+    app.callback(Output('tab-content', 'children'), *ENTREES_ONGLET)(render_tab_content)
+else:
+    # Calcul dans un processus fils : Dash tue le calcul précédent encore en
+    # cours quand les filtres changent, et sert directement un résultat déjà
+    # en cache (l'identifiant de session est exclu de la clé). Les métriques
+    # et le cache LRU du processus fils sont perdus : /metrics ne voit pas ces
+    # calculs, le cache disque de Dash remplace cache_onglets.
+    @app.callback(
+        Output('tab-content', 'children'),
+        *ENTREES_ONGLET,
+        State('session-id', 'data'),
+        background=True,
+        manager=gestionnaire_taches,
+        interval=300,
+        progress=[Output('progression-onglet', 'value'), Output('progression-onglet', 'label')],
+        running=[(Output('progression-onglet', 'style'), {'display': 'flex'}, {'display': 'none'})],
+        cache_args_to_ignore=[5],
+    )
+    def render_tab_content_fond(set_progress, active_tab, type_filter, assur_filter, year_filter,
+                                date_reference, session):
+        def progression(valeur, libelle):
+            set_progress((valeur, libelle))
+
+        # Requêtes identiques simultanées (ouverture du tableau de bord par
+        # tous en même temps) : un seul calcul, résultat partagé
+        jeu = donnees.jeu_courant()
+        jour = precalcul.jour_reference(date_reference)
+        cle = (active_tab, normaliser_filtres(type_filter, assur_filter, year_filter), jour.date().isoformat(),
+               jeu.identifiant, datetime.today().date().isoformat())
+        def calculer():
+            return taches.une_fois(
+                gestionnaire_taches, cle,
+                lambda: render_onglet(jeu, active_tab, type_filter, assur_filter, year_filter, jour, progression),
+                lambda: progression(5, "Calcul partagé en cours"))
+
+        try:
+            with taches.creneau(gestionnaire_taches, session, lambda: progression(0, "En attente")):
+                return calculer()
+        except taches.CreneauIndisponible as exc:
+            # Plutôt qu'une erreur gardée en cache pour tous (cache_by) : calcul
+            # hors limite de la session
+            logger.warning("%s, calcul sans créneau", exc)
+            return calculer()
+
+# Un callback par section de la vue générale, chronométré (/metrics)
+def _chronometrer(section_id, fonction, sel):
+    metriques.observer('dash_lignes_filtrees', sel.nb_lignes, callback=section_id)
+    debut = time.perf_counter()
+    resultat = fonction(sel)
+    duree = time.perf_counter() - debut
+
+    metriques.observer('dash_section_secondes', duree, section=section_id)
+    logger.info("Section %s calculée en %.3fs", section_id, duree)
+    return resultat
+
+
+def _enregistrer_section(section_id, fonction):
+    @app.callback(
+        Output(section_id, 'children'),
+        Input('filter-type', 'value'),
+        Input('filter-assureur', 'value'),
+        Input('filter-year', 'value'),
+        Input('filter-date', 'date'),
+    )
+    @metriques.instrumenter_callback(section_id)
+    def update_section(type_filter, assur_filter, year_filter, date_reference):
+        jeu = donnees.jeu_courant()
+        jour = precalcul.jour_reference(date_reference)
+        cle = (section_id, normaliser_filtres(type_filter, assur_filter, year_filter), jour, jeu.version)
+        return cache_onglets.obtenir(
+            cle, lambda: _chronometrer(section_id, fonction,
+                                       jeu.selection(type_filter, assur_filter, year_filter, jour)))
+
+
+for section_id, fonction in SECTIONS_GENERAL.items():
+    _enregistrer_section(section_id, fonction)
+
+GRAPHES_ASSUREUR = ['graph-assureur-montant', 'graph-assureur-nb', 'graph-assureur-taux']
+
+
+# Détail d'un assureur au clic sur une de ses barres (onglet assurance). Les
+# filtres sont des State : un changement de filtre redessine tout l'onglet.
+@app.callback(
+    Output('detail-assureur', 'children'),
+    *[Input(graphe, 'clickData') for graphe in GRAPHES_ASSUREUR],
+    State('filter-type', 'value'),
+    State('filter-assureur', 'value'),
+    State('filter-year', 'value'),
+    State('filter-date', 'date'),
+    prevent_initial_call=True,
 )
-def render_tab_content(active_tab, type_filter, assur_filter, year_filter):
-    dff = df.copy()
-    if type_filter:
-        dff = dff[dff['libelle nature'].isin(type_filter)]
-    if assur_filter:
-        dff = dff[dff['nom garant'].isin(assur_filter)]
-    if year_filter:
-        dff = dff[dff['date de mise en place'].dt.year.isin(year_filter)]
-
-    if active_tab == "tab-general":
-        return render_general_tab(dff)
-    elif active_tab == "tab-financier":
-        return render_financier_tab(dff)
-    elif active_tab == "tab-partenaire":
-        return render_partenaire_tab(dff)
-    elif active_tab == "tab-reevaluation":
-        return render_reevaluation_tab(dff)
-    return html.Div("Sélectionnez un onglet.")
-
-# Layout principal
-app.layout = dbc.Container([
-    html.H1("Tableau de Bord - xxx", className="text-center my-4"),
-    dbc.Row([
-        dbc.Col([
-            dcc.Dropdown(id='filter-type', options=[{'label': i, 'value': i} for i in df['libelle nature'].dropna().unique()],multi=True, placeholder="Filtrer par type de garantie"), ], md=4),
-        dbc.Col([
-            dcc.Dropdown(id='filter-assureur', options=[{'label': i, 'value': i} for i in df['nom garant'].dropna().unique()],
-                         multi=True, placeholder="Filtrer par assureur"),
-        ], md=4),
-        dbc.Col([
-            dcc.Dropdown(id='filter-year', options=[{'label': str(i), 'value': i} for i in sorted(df['date de mise en place'].dt.year.dropna().unique())],
-                         multi=True, placeholder="Filtrer par année"),
-        ], md=4),
-    ], className="mb-4"),
-
-    dbc.Tabs(id='tabs', active_tab='tab-general', children=[
-        dbc.Tab(label="Vue Générale", tab_id='tab-general'),
-        dbc.Tab(label="Vue Financière", tab_id='tab-financier'),
-        dbc.Tab(label="Vue Assurance", tab_id='tab-partenaire'),
-        dbc.Tab(label="Vue Réevaluation", tab_id='tab-reevaluation'),
-    ]),
-
-    html.Div(id='tab-content', className="mt-4"),
-])
+@metriques.instrumenter_callback('afficher_detail_assureur')
+def afficher_detail_assureur(clic_montant, clic_nb, clic_taux, type_filter, assur_filter, year_filter,
+                             date_reference):
+    clic = dict(zip(GRAPHES_ASSUREUR, (clic_montant, clic_nb, clic_taux))).get(dash.ctx.triggered_id)
+    if not clic or not clic.get('points'):
+        return dash.no_update
+    garant = clic['points'][0]['x']
+    jeu = donnees.jeu_courant()
+    jour = precalcul.jour_reference(date_reference)
+    cle = ('detail-assureur', garant, normaliser_filtres(type_filter, assur_filter, year_filter), jour, jeu.version)
+    return cache_onglets.obtenir(
+        cle, lambda: render_detail_assureur(jeu.selection(type_filter, assur_filter, year_filter, jour), garant))
+
+# Pagination, tri et filtrage du tableau des échéances côté serveur
+@app.callback(
+    Output('table-echeances', 'data'),
+    Output('table-echeances', 'tooltip_data'),
+    Output('table-echeances', 'page_count'),
+    Input('table-echeances', 'page_current'),
+    Input('table-echeances', 'page_size'),
+    Input('table-echeances', 'sort_by'),
+    Input('table-echeances', 'filter_query'),
+    Input('filter-type', 'value'),
+    Input('filter-assureur', 'value'),
+    Input('filter-year', 'value'),
+    Input('filter-date', 'date'),
+)
+@metriques.instrumenter_callback('update_echeance_table')
+def update_echeance_table(page_current, page_size, sort_by, filter_query,
+                          type_filter, assur_filter, year_filter, date_reference):
+    jeu = donnees.jeu_courant()
+    jour = precalcul.jour_reference(date_reference)
+    tri = tuple((s['column_id'], s['direction']) for s in sort_by or ())
+    cle = ('table-echeances', normaliser_filtres(type_filter, assur_filter, year_filter), jour, jeu.version,
+           page_current or 0, page_size, tri, filter_query or '')
+    return cache_onglets.obtenir(
+        cle, lambda: page_echeances_filtrees(jeu.selection(type_filter, assur_filter, year_filter, jour),
+                                             page_current or 0, page_size, sort_by, filter_query))
+
+
+def page_echeances_filtrees(sel, page_current, page_size, sort_by, filter_query):
+    echeances = filtrer_echeances(echeances_3mois(sel), filter_query)
+    data, tooltips = page_echeances(echeances, page_current, page_size, sort_by)
+    return data, tooltips, max(-(-len(echeances) // page_size), 1)
+
+# Layout principal (recalculé à chaque chargement de page pour refléter le dernier extrait)
+def serve_layout():
+    # Options des filtres lues dans les métadonnées du Jeu, pas dans les lignes
+    options = donnees.jeu_courant().options
+    return dbc.Container([
+        html.H1("Tableau de Bord - xxx", className="text-center my-4"),
+        dbc.Row([
+            dbc.Col([
+                dcc.Dropdown(id='filter-type', options=[{'label': i, 'value': i} for i in options['libelle nature']],multi=True, placeholder="Filtrer par type de garantie"), ], md=3),
+            dbc.Col([
+                dcc.Dropdown(id='filter-assureur', options=[{'label': i, 'value': i} for i in options['nom garant']],
+                             multi=True, placeholder="Filtrer par assureur"),
+            ], md=3),
+            dbc.Col([
+                dcc.Dropdown(id='filter-year', options=[{'label': str(i), 'value': i} for i in options['annee']],
+                             multi=True, placeholder="Filtrer par année"),
+            ], md=3),
+            dbc.Col([
+                # Date d'observation : les indicateurs relatifs au jour
+                # (échéances, renouvellements, garanties actives) sont
+                # calculés à cette date, aujourd'hui si elle est vide
+                dcc.DatePickerSingle(id='filter-date', display_format='DD/MM/YYYY', clearable=True,
+                                     first_day_of_week=1, placeholder="Au (aujourd'hui)"),
+            ], md=3),
+        ], className="mb-4"),
+
+        dbc.Tabs(id='tabs', active_tab='tab-general', children=[
+            dbc.Tab(label="Vue Générale", tab_id='tab-general'),
+            dbc.Tab(label="Vue Financière", tab_id='tab-financier'),
+            dbc.Tab(label="Vue Assurance", tab_id='tab-partenaire'),
+            dbc.Tab(label="Vue Réevaluation", tab_id='tab-reevaluation'),
+        ]),
+
+        dbc.Progress(id='progression-onglet', value=0, striped=True, animated=True,
+                     className="mt-3", style={'display': 'none'}),
+        html.Div(id='tab-content', className="mt-4"),
+        # Identifiant de session (partagé par les onglets du navigateur) pour
+        # limiter les calculs simultanés d'un même utilisateur
+        dcc.Store(id='session-id', storage_type='local', data=uuid.uuid4().hex),
+    ])
+
+
+app.layout = serve_layout
+
+# Un premier layout construit au démarrage mesure la dernière phase
+if PROCESSUS_PRINCIPAL:
+    with metriques.phase('layout'):
+        serve_layout()
+    metriques.rapport_demarrage()
 
 if __name__ == "__main__":
     app.run(debug=True)
\ No newline at end of file
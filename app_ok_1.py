@@ -1,54 +1,72 @@
+import time
+
+# Début du démarrage : le rapport de démarrage découpe le temps jusqu'au
+# premier layout en import, chargement des données et layout
+DEBUT_DEMARRAGE = time.perf_counter()
+
 import dash
 from dash import dcc, html
 import dash_bootstrap_components as dbc
 from dash.dependencies import Input, Output
 import pandas as pd
-from datetime import datetime, timedelta
-import plotly.express as px
+import logging
+
+import donnees
+import kpi
+import metriques
+import precalcul
+from figures import par_client, repartition
+from index_filtres import selectionner
 
-# Chargement des données
-df = pd.read_excel('data/delegation0.xlsx', sheet_name='Sheet1')
-df.columns = df.columns.str.strip()
+# Chaque figure plotly express construite est chronométrée (/metrics) ;
+# plotly.express n'est importé qu'à la première figure
+px = metriques.chronometrer_figures('plotly.express')
 
-# Conversion des dates
-for col in ['date de mise en place', 'date d echeance', 'date de saisie',
-            'date de derniere reevaluation', 'date de maturite de l engagement']:
-    df[col] = pd.to_datetime(df[col], dayfirst=True, errors='coerce')
+logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+metriques.enregistrer_phase('import', time.perf_counter() - DEBUT_DEMARRAGE)
 
-df['duree_garantie'] = (df['date d echeance'] - df['date de mise en place']).dt.days
+# Les processus de lecture des extraits (forkserver, voir donnees._snapshots)
+# réimportent ce script sous le nom __mp_main__ : ils n'en gardent que les
+# définitions, sans chargement des données.
+PROCESSUS_PRINCIPAL = __name__ != '__mp_main__'
+
+# Chargement des données (snapshot Parquet réutilisé tant que l'Excel ne change pas)
+if PROCESSUS_PRINCIPAL:
+    with metriques.phase('chargement'):
+        jeu = donnees.initialiser(donnees.SOURCE)
+    df, index = jeu.df, jeu.index
 
 # Setup Dash
 app = dash.Dash(__name__, external_stylesheets=[dbc.themes.FLATLY])#QUARTZ  SKETCHY MINTY SOLAR
 server = app.server
+metriques.installer(server)
 
-def render_general_tab(dff):
-    today = datetime.today()
-    
-    # Calcul des indicateurs principaux
-    clients = dff['code client'].nunique()
-    total = len(dff)
-    actives = len(dff[dff['situationde la garantie'] == 'Active'])
-    expires = len(dff[dff['situationde la garantie'] == 'Expirée'])
-    resilies = len(dff[dff['situationde la garantie'] == 'Résiliée'])
+def render_general_tab(dff, jour):
+    # Calcul des indicateurs (une seule passe sur les lignes)
+    ind = kpi.calculer(dff, jour)
+    clients = ind.clients
+    total = ind.total
+    actives = ind.actives
+    expires = ind.expirees
+    resilies = ind.resiliees
     
     # Calcul des montants
-    mt_total_val = dff['montant de la garantie'].sum()
-    mt_total = f"{mt_total_val:,.2f} €"
-    mt_mean = f"{dff['montant de la garantie'].mean():,.2f} €"
-    eng_val = dff['montant engagement couvert actualisé'].sum()
-    mt_eng = f"{eng_val:,.2f} €"
-    ratio = mt_total_val / eng_val if eng_val > 0 else 0
-    ratio_str = f"{ratio:.2%}"
+    mt_total = f"{ind.mt_total:,.2f} €"
+    mt_mean = f"{ind.mt_moyen:,.2f} €"
+    mt_eng = f"{ind.eng_total:,.2f} €"
+    ratio_str = f"{ind.ratio:.2%}"
     
     # Calcul des indicateurs temporels
-    echeance3 = len(dff[(dff['date d echeance'] >= today) & (dff['date d echeance'] <= today + timedelta(days=90))])
-    renouv = len(dff[dff['date de mise en place'] >= today - timedelta(days=30)])
-    duree = f"{dff['duree_garantie'].mean():.0f} j"
-    delai = f"{(dff['date de mise en place'] - dff['date de saisie']).dt.days.mean():.0f} j"
+    echeance3 = ind.echeances_3mois
+    renouv = ind.renouvellements_30j
+    duree = f"{ind.duree_moyenne:.0f} j"
+    delai = f"{ind.delai_moyen:.0f} j"
     
     # Création des graphiques
-    fig_type = px.pie(dff, names='libelle nature', title='Répartition par type de garantie')
-    fig_seg = px.pie(dff, names='libelle segment', title='Répartition par segment')
+    fig_type = px.pie(repartition(dff['libelle nature']), names='libelle nature', values='nb',
+                      title='Répartition par type de garantie')
+    fig_seg = px.pie(repartition(dff['libelle segment']), names='libelle segment', values='nb',
+                     title='Répartition par segment')
     
     fig_top10 = px.bar(
         dff.nlargest(10, 'montant de la garantie'),
@@ -59,8 +77,8 @@ def render_general_tab(dff):
     
     bins = [0, 1e6, 5e6, float('inf')]
     labels = ['<1M', '1-5M', '>5M']
-    dff['tranche'] = pd.cut(dff['montant de la garantie'], bins=bins, labels=labels)
-    fig_dist = px.pie(dff, names='tranche', title='Répartition par montant')
+    tranche = pd.cut(dff['montant de la garantie'], bins=bins, labels=labels).rename('tranche')
+    fig_dist = px.pie(repartition(tranche), names='tranche', values='nb', title='Répartition par montant')
     
     hist = dff.groupby(dff['date de mise en place'].dt.to_period('M')).size().reset_index(name='count')
     hist['date'] = hist['date de mise en place'].astype(str)
@@ -110,14 +128,12 @@ def render_general_tab(dff):
 
         dbc.Row(dbc.Col(html.Footer("© 2025 Dashboard Assurance", className="text-center mt-4")))
     ])
-def render_financier_tab(dff):
-    mt_total_val = dff['montant de la garantie'].sum()
-    mt_total = f"{mt_total_val:,.2f} €"
-    mt_mean = f"{dff['montant de la garantie'].mean():,.2f} €"
-    eng_val = dff['montant engagement couvert actualisé'].sum()
-    mt_eng = f"{eng_val:,.2f} €"
-    ratio = mt_total_val / eng_val if eng_val > 0 else 0
-    ratio_str = f"{ratio:.2%}"
+def render_financier_tab(dff, jour):
+    ind = kpi.calculer(dff, jour)
+    mt_total = f"{ind.mt_total:,.2f} €"
+    mt_mean = f"{ind.mt_moyen:,.2f} €"
+    mt_eng = f"{ind.eng_total:,.2f} €"
+    ratio_str = f"{ind.ratio:.2%}"
 
     return dbc.Row([
         dbc.Col(dbc.Card([dbc.CardHeader("Montant total garanties"), dbc.CardBody(html.H4(mt_total))]), md=3),
@@ -126,16 +142,17 @@ def render_financier_tab(dff):
         dbc.Col(dbc.Card([dbc.CardHeader("Ratio garantie / engagement"), dbc.CardBody(html.H4(ratio_str))]), md=3),
     ])
 
-def render_partenaire_tab(dff):
+def render_partenaire_tab(dff, jour):
     # Montant total garanti par assureur
-    mt_par_assureur = dff.groupby('nom garant')['montant de la garantie'].sum().reset_index()
-    nbr_garantie = dff.groupby('nom garant').size().reset_index(name='nbr_garantie')
+    mt_par_assureur = dff.groupby('nom garant', observed=True)['montant de la garantie'].sum().reset_index()
+    nbr_garantie = dff.groupby('nom garant', observed=True).size().reset_index(name='nbr_garantie')
 
-    # Taux de renouvellement par assureur (nombre garanties mises en place dernièrement / total garanties)
-    today = datetime.today()
-    dernier_30j = dff[dff['date de mise en place'] >= today - timedelta(days=30)]
-    renouv_par_assureur = dernier_30j.groupby('nom garant').size().reset_index(name='renouvellements')
-    total_par_assureur = dff.groupby('nom garant').size().reset_index(name='total_garanties')
+    # Taux de renouvellement par assureur (nombre garanties mises en place dernièrement / total garanties),
+    # sur la même fenêtre que l'indicateur Renouvellements 30j
+    colonne, debut, _ = precalcul.bornes('renouvellements_30j', jour)
+    dernier_30j = dff[dff[colonne] >= debut]
+    renouv_par_assureur = dernier_30j.groupby('nom garant', observed=True).size().reset_index(name='renouvellements')
+    total_par_assureur = dff.groupby('nom garant', observed=True).size().reset_index(name='total_garanties')
 
     taux_renouv = renouv_par_assureur.merge(total_par_assureur, on='nom garant', how='left')
     taux_renouv['tx_renouvellement'] = taux_renouv['renouvellements'] / taux_renouv['total_garanties']
@@ -150,19 +167,20 @@ def render_partenaire_tab(dff):
         dbc.Col(dcc.Graph(figure=fig_tx), md=4),
     ])
 
-def render_reevaluation_tab(dff):
-    today = datetime.today()
-    reevalues_30j = dff[dff['date de derniere reevaluation'] >= today - timedelta(days=30)]
+def render_reevaluation_tab(dff, jour):
+    colonne, debut, _ = precalcul.bornes('reevaluations_30j', jour)
+    reevalues_30j = dff[dff[colonne] >= debut]
     nb_reevalues = len(reevalues_30j)
     mt_reevalues = reevalues_30j['montant de la garantie'].sum()
 
-    fig_nb = px.histogram(reevalues_30j, x='nom client', title="Nombre de réévaluations (30 derniers jours)", 
-                          labels={'nom client': 'Client'}, nbins=20)
+    # Agrégats par client côté serveur (top clients + "Autres")
+    nb_par_client, mt_par_client = par_client(reevalues_30j)
+    fig_nb = px.bar(nb_par_client, x='nom client', y='nb', title="Nombre de réévaluations (30 derniers jours)",
+                    labels={'nom client': 'Client', 'nb': 'Nombre'})
     
-    fig_mt = px.histogram(reevalues_30j, x='nom client', y='montant de la garantie', 
-                          title="Montant des garanties réévaluées", 
-                          labels={'montant de la garantie': 'Montant (€)', 'nom client': 'Client'}, 
-                          histfunc='sum')
+    fig_mt = px.bar(mt_par_client, x='nom client', y='montant',
+                    title="Montant des garanties réévaluées", 
+                    labels={'montant': 'Montant (€)', 'nom client': 'Client'})
 
     return html.Div([
         html.H4("Réévaluations récentes", className="mt-4"),
@@ -190,53 +208,69 @@ def render_reevaluation_tab(dff):
     Input('filter-type', 'value'),
     Input('filter-assureur', 'value'),
     Input('filter-year', 'value'),
+    Input('filter-date', 'date'),
 )
-def render_tab_content(active_tab, type_filter, assur_filter, year_filter):
-    dff = df.copy()
-    if type_filter:
-        dff = dff[dff['libelle nature'].isin(type_filter)]
-    if assur_filter:
-        dff = dff[dff['nom garant'].isin(assur_filter)]
-    if year_filter:
-        dff = dff[dff['date de mise en place'].dt.year.isin(year_filter)]
+def render_tab_content(active_tab, type_filter, assur_filter, year_filter, date_reference=None):
+    # Filtrage par masques précalculés (pas de copie ni de scan isin par clic)
+    dff = selectionner(df, index, type_filter, assur_filter, year_filter)
+    # Fenêtres relatives au jour ancrées à minuit de la date d'observation
+    # (aujourd'hui par défaut), comme dans app.py
+    jour = precalcul.jour_reference(date_reference)
 
     if active_tab == "tab-general":
-        return render_general_tab(dff)
+        return render_general_tab(dff, jour)
     elif active_tab == "tab-financier":
-        return render_financier_tab(dff)
+        return render_financier_tab(dff, jour)
     elif active_tab == "tab-partenaire":
-        return render_partenaire_tab(dff)
+        return render_partenaire_tab(dff, jour)
     elif active_tab == "tab-reevaluation":
-        return render_reevaluation_tab(dff)
+        return render_reevaluation_tab(dff, jour)
     return html.Div("Sélectionnez un onglet.")
 
-# Layout principal
-app.layout = dbc.Container([
-    html.H1("Tableau de Bord - Garanties", className="text-center my-4"),
-    dbc.Row([
-        dbc.Col([
-            dcc.Dropdown(id='filter-type', options=[{'label': i, 'value': i} for i in df['libelle nature'].dropna().unique()],
-                         multi=True, placeholder="Filtrer par type de garantie"),
-        ], md=4),
-        dbc.Col([
-            dcc.Dropdown(id='filter-assureur', options=[{'label': i, 'value': i} for i in df['nom garant'].dropna().unique()],
-                         multi=True, placeholder="Filtrer par assureur"),
-        ], md=4),
-        dbc.Col([
-            dcc.Dropdown(id='filter-year', options=[{'label': str(i), 'value': i} for i in sorted(df['date de mise en place'].dt.year.dropna().unique())],
-                         multi=True, placeholder="Filtrer par année"),
-        ], md=4),
-    ], className="mb-4"),
-
-    dbc.Tabs(id='tabs', active_tab='tab-general', children=[
-        dbc.Tab(label="Vue Générale", tab_id='tab-general'),
-        dbc.Tab(label="Vue Financière", tab_id='tab-financier'),
-        dbc.Tab(label="Vue Assurance", tab_id='tab-partenaire'),
-        dbc.Tab(label="Vue Réevaluation", tab_id='tab-reevaluation'),
-    ]),
-
-    html.Div(id='tab-content', className="mt-4"),
-])
+# Layout principal (construit au chargement de la page, jamais dans les processus de lecture)
+def serve_layout():
+    # Options des filtres lues dans les métadonnées du Jeu, pas dans les lignes
+    options = jeu.options
+    return dbc.Container([
+        html.H1("Tableau de Bord - Garanties", className="text-center my-4"),
+        dbc.Row([
+            dbc.Col([
+                dcc.Dropdown(id='filter-type', options=[{'label': i, 'value': i} for i in options['libelle nature']],
+                             multi=True, placeholder="Filtrer par type de garantie"),
+            ], md=3),
+            dbc.Col([
+                dcc.Dropdown(id='filter-assureur', options=[{'label': i, 'value': i} for i in options['nom garant']],
+                             multi=True, placeholder="Filtrer par assureur"),
+            ], md=3),
+            dbc.Col([
+                dcc.Dropdown(id='filter-year', options=[{'label': str(i), 'value': i} for i in options['annee']],
+                             multi=True, placeholder="Filtrer par année"),
+            ], md=3),
+            dbc.Col([
+                # Date d'observation des indicateurs relatifs au jour
+                # (échéances, renouvellements, réévaluations)
+                dcc.DatePickerSingle(id='filter-date', display_format='DD/MM/YYYY', clearable=True,
+                                     first_day_of_week=1, placeholder="Au (aujourd'hui)"),
+            ], md=3),
+        ], className="mb-4"),
+
+        dbc.Tabs(id='tabs', active_tab='tab-general', children=[
+            dbc.Tab(label="Vue Générale", tab_id='tab-general'),
+            dbc.Tab(label="Vue Financière", tab_id='tab-financier'),
+            dbc.Tab(label="Vue Assurance", tab_id='tab-partenaire'),
+            dbc.Tab(label="Vue Réevaluation", tab_id='tab-reevaluation'),
+        ]),
+
+        html.Div(id='tab-content', className="mt-4"),
+    ])
+
+
+# Dash construit le layout dès qu'il est affecté (validation des callbacks) :
+# c'est la dernière phase du démarrage
+if PROCESSUS_PRINCIPAL:
+    with metriques.phase('layout'):
+        app.layout = serve_layout
+    metriques.rapport_demarrage()
 
 if __name__ == "__main__":
     app.run(debug=True)
\ No newline at end of file
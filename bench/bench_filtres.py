@@ -0,0 +1,45 @@
+# Compare le filtrage historique de render_tab_content (copie + isin) à
+# l'index de masques précalculés.
+#   python bench/bench_filtres.py [nb_lignes]
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from donnees import preparer  # noqa: E402
+from generer import generer  # noqa: E402
+from index_filtres import IndexFiltres, selectionner  # noqa: E402
+
+
+def filtrage_historique(df, type_filter, assur_filter, year_filter):
+    dff = df.copy()
+    if type_filter:
+        dff = dff[dff['libelle nature'].isin(type_filter)]
+    if assur_filter:
+        dff = dff[dff['nom garant'].isin(assur_filter)]
+    if year_filter:
+        dff = dff[dff['date de mise en place'].dt.year.isin(year_filter)]
+    return dff
+
+
+def main(n):
+    df = preparer(generer(n))
+    t = timeit.default_timer()
+    index = IndexFiltres(df)
+    print(f"{n} lignes, construction de l'index : {timeit.default_timer() - t:.3f}s")
+
+    cas = {
+        'aucun filtre': (None, None, None),
+        'type': (['Nature 1', 'Nature 2'], None, None),
+        'type+assureur+année': (['Nature 1', 'Nature 2'], ['Garant 3'], [2019, 2020]),
+    }
+    for nom, filtres in cas.items():
+        assert len(filtrage_historique(df, *filtres)) == len(selectionner(df, index, *filtres))
+        avant = min(timeit.repeat(lambda: filtrage_historique(df, *filtres), number=5, repeat=3)) / 5
+        apres = min(timeit.repeat(lambda: selectionner(df, index, *filtres), number=5, repeat=3)) / 5
+        print(f"{nom:22s} copie+isin {avant * 1000:8.1f} ms   index {apres * 1000:8.1f} ms   x{avant / apres:.1f}")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
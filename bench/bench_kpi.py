@@ -0,0 +1,76 @@
+# Compare le calcul des indicateurs tel qu'il était recopié dans les
+# applications (un filtre et une copie par indicateur) au moteur kpi.calculer
+# (une passe), sur des portefeuilles synthétiques.
+#   python bench/bench_kpi.py --tailles 10000 100000 1000000
+import argparse
+import math
+import os
+import sys
+import timeit
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import kpi  # noqa: E402
+import precalcul  # noqa: E402
+from donnees import preparer  # noqa: E402
+from generer import generer  # noqa: E402
+from index_filtres import IndexFiltres, selectionner  # noqa: E402
+
+FILTRES = [(None, None, None),
+           (['Nature 1', 'Nature 2'], ['Garant 3', 'Garant 4'], None)]
+
+
+def ancien(dff, today):
+    # Code d'origine des onglets (app_ok_1 / app_ok_genl), fenêtres au jour
+    clients = dff['code client'].nunique()
+    total = len(dff)
+    actives = len(dff[dff['situationde la garantie'] == 'Active'])
+    expires = len(dff[dff['situationde la garantie'] == 'Expirée'])
+    resilies = len(dff[dff['situationde la garantie'] == 'Résiliée'])
+    mt_total_val = dff['montant de la garantie'].sum()
+    mt_mean = dff['montant de la garantie'].mean()
+    eng_val = dff['montant engagement couvert actualisé'].sum()
+    echeance3 = len(dff[(dff['date d echeance'] >= today) & (dff['date d echeance'] <= today + pd.Timedelta(days=90))])
+    renouv = len(dff[dff['date de mise en place'] >= today - pd.Timedelta(days=30)])
+    duree = dff['duree_garantie'].mean()
+    delai = (dff['date de mise en place'] - dff['date de saisie']).dt.days.mean()
+    return kpi.Indicateurs(clients, total, actives, expires, resilies, mt_total_val, mt_mean, eng_val,
+                           echeance3, renouv, duree, delai)
+
+
+def identiques(a, b):
+    for champ in a.__dataclass_fields__:
+        x, y = getattr(a, champ), getattr(b, champ)
+        if isinstance(x, float) and (math.isnan(x) or math.isnan(y)):
+            if not (math.isnan(x) and math.isnan(y)):
+                return False
+        elif not math.isclose(x, y, rel_tol=1e-12):
+            return False
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--tailles', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--repetitions', type=int, default=5)
+    args = parser.parse_args()
+
+    jour = precalcul.aujourd_hui()
+    print(f"{'lignes':>10s} {'filtre':>7s} {'ancien (ms)':>12s} {'kpi (ms)':>10s} {'gain':>6s}")
+    for n in args.tailles:
+        df = preparer(generer(n))
+        index = IndexFiltres(df)
+        for i, filtres in enumerate(FILTRES):
+            dff = selectionner(df, index, *filtres)
+            assert identiques(ancien(dff, jour), kpi.calculer(dff, jour))
+            t_ancien = min(timeit.repeat(lambda: ancien(dff, jour), number=1, repeat=args.repetitions))
+            t_kpi = min(timeit.repeat(lambda: kpi.calculer(dff, jour), number=1, repeat=args.repetitions))
+            print(f"{n:10d} {'oui' if i else 'non':>7s} {t_ancien * 1000:12.1f} {t_kpi * 1000:10.1f} "
+                  f"{t_ancien / t_kpi:5.1f}x")
+
+
+if __name__ == '__main__':
+    main()
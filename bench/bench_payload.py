@@ -0,0 +1,44 @@
+# Taille du JSON envoyé au navigateur pour chaque figure : construite sur les
+# lignes (avant) ou sur les agrégats de figures.py (après).
+#   python bench/bench_payload.py [nb_lignes]
+import os
+import sys
+
+import pandas as pd
+import plotly.express as px
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from donnees import preparer  # noqa: E402
+from figures import par_client, repartition  # noqa: E402
+from generer import generer  # noqa: E402
+
+
+def main(n):
+    df = preparer(generer(n))
+    tranche = pd.cut(df['montant de la garantie'], bins=[0, 1e6, 5e6, float('inf')],
+                     labels=['<1M', '1-5M', '>5M']).rename('tranche')
+    reevalues = df[df['date de derniere reevaluation'] >= pd.Timestamp.today() - pd.Timedelta(days=30)]
+    nb_par_client, mt_par_client = par_client(reevalues)
+
+    figures = {
+        'type de garantie': (px.pie(df, names='libelle nature'),
+                             px.pie(repartition(df['libelle nature']), names='libelle nature', values='nb')),
+        'segment': (px.pie(df, names='libelle segment'),
+                    px.pie(repartition(df['libelle segment']), names='libelle segment', values='nb')),
+        'tranche de montant': (px.pie(names=tranche),
+                               px.pie(repartition(tranche), names='tranche', values='nb')),
+        'réévaluations / client': (px.histogram(reevalues, x='nom client'),
+                                   px.bar(nb_par_client, x='nom client', y='nb')),
+        'montant réévalué / client': (px.histogram(reevalues, x='nom client', y='montant de la garantie',
+                                                   histfunc='sum'),
+                                      px.bar(mt_par_client, x='nom client', y='montant')),
+    }
+    print(f"{n} lignes ({len(reevalues)} réévaluées sur 30 jours)")
+    print(f"{'figure':28s} {'avant (octets)':>15s} {'après (octets)':>15s}")
+    for nom, (avant, apres) in figures.items():
+        print(f"{nom:28s} {len(avant.to_json()):15d} {len(apres.to_json()):15d}")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
@@ -0,0 +1,125 @@
+# Chronomètre le chargement et les fonctions de rendu des tableaux de bord sur
+# des portefeuilles synthétiques, et compare à une référence enregistrée.
+#   python bench/bench_rendu.py --tailles 10000 100000 --baseline bench/baseline.json
+#   python bench/bench_rendu.py --tailles 10000 100000 --enregistrer bench/baseline.json
+import argparse
+import json
+import os
+import sys
+import tempfile
+import timeit
+import tracemalloc
+
+RACINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, RACINE)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from generer import ecrire, generer  # noqa: E402
+
+FILTRES = [(None, None, None),
+           (['Nature 1', 'Nature 2'], ['Garant 3', 'Garant 4'], None)]
+
+
+def mesurer(fonction, repetitions=3):
+    # (meilleur temps en secondes, pic mémoire Python en octets)
+    tracemalloc.start()
+    fonction()
+    _, pic = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    temps = min(timeit.repeat(fonction, number=1, repeat=repetitions))
+    return {'temps': temps, 'memoire': pic}
+
+
+def importer_apps():
+    # Les applications chargent leur extrait à l'import : on leur donne un petit
+    # fichier synthétique, puis on substitue le portefeuille à mesurer.
+    rep = tempfile.mkdtemp()
+    source = os.path.join(rep, 'delegation.xlsx')
+    ecrire(generer(1000), source)
+    os.environ['DELEGATION_SOURCE'] = source
+    os.chdir(RACINE)
+    import app
+    import app_ok_genl
+    return app, app_ok_genl
+
+
+def bench_taille(n, app, app_ok_genl, max_excel):
+    import donnees
+    import ingestion
+    from index_filtres import IndexFiltres
+
+    resultats = {}
+    brut = generer(n)
+
+    if n <= max_excel:
+        with tempfile.TemporaryDirectory() as rep:
+            chemin = os.path.join(rep, 'delegation.xlsx')
+            ecrire(brut, chemin)
+            resultats['chargement excel'] = mesurer(lambda: donnees.lire_excel(chemin), repetitions=1)
+            resultats['ingestion excel en flux'] = mesurer(
+                lambda: ingestion.ingerer(chemin, os.path.join(rep, 'flux.parquet'), donnees.typer), repetitions=1)
+
+    resultats['preparation (dates, types)'] = mesurer(lambda: donnees.preparer(brut.copy()))
+    df = donnees.preparer(brut.copy())
+    resultats['construction Jeu (index, cube)'] = mesurer(lambda: donnees.Jeu(df, 1, 'synthetique'), 1)
+
+    jeu = donnees.Jeu(df, n, 'synthetique')
+    donnees._publier(jeu)
+    app_ok_genl.df, app_ok_genl.index = df, IndexFiltres(df)
+
+    for i, filtres in enumerate(FILTRES):
+        suffixe = ' [filtré]' if i else ''
+        sel = jeu.selection(*filtres)
+        resultats['filtre' + suffixe] = mesurer(lambda: jeu.selection(*filtres).dff)
+        for section_id, fonction in app.SECTIONS_GENERAL.items():
+            resultats[section_id + suffixe] = mesurer(lambda: fonction(jeu.selection(*filtres)))
+        resultats['render_financier_tab' + suffixe] = mesurer(lambda: app.render_financier_tab(sel))
+        resultats['render_partenaire_tab' + suffixe] = mesurer(lambda: app.render_partenaire_tab(sel))
+        resultats['render_reevaluation_tab' + suffixe] = mesurer(lambda: app.render_reevaluation_tab(sel))
+        resultats['create_echeance_table' + suffixe] = mesurer(lambda: app.create_echeance_table(sel))
+        # Corps du callback, sans le cache de rendus (toutes les répétitions
+        # après la première seraient des hits)
+        resultats['update_echeance_table' + suffixe] = mesurer(
+            lambda: app.page_echeances_filtrees(jeu.selection(*filtres), 0, 10, [], ''))
+        resultats['app_ok_genl.update_all' + suffixe] = mesurer(lambda: app_ok_genl.update_all(*filtres))
+    return resultats
+
+
+def afficher(n, resultats, reference):
+    print(f"\n=== {n} lignes ===")
+    print(f"{'mesure':45s} {'temps (ms)':>11s} {'pic (Mo)':>9s} {'vs réf.':>8s}")
+    for nom, mesure in resultats.items():
+        ratio = ''
+        ref = reference.get(str(n), {}).get(nom)
+        if ref and ref['temps'] > 0:
+            ratio = f"x{mesure['temps'] / ref['temps']:.2f}"
+        print(f"{nom:45s} {mesure['temps'] * 1000:11.1f} {mesure['memoire'] / 1e6:9.1f} {ratio:>8s}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--tailles', type=int, nargs='+', default=[10_000, 100_000, 1_000_000, 10_000_000])
+    parser.add_argument('--max-excel', type=int, default=100_000,
+                        help="taille maximale pour laquelle on mesure la lecture d'un vrai .xlsx")
+    parser.add_argument('--baseline', help='fichier JSON de référence à comparer')
+    parser.add_argument('--enregistrer', help='écrit les résultats dans ce fichier JSON')
+    args = parser.parse_args()
+
+    reference = {}
+    if args.baseline and os.path.exists(args.baseline):
+        with open(args.baseline, encoding='utf-8') as f:
+            reference = json.load(f)
+
+    app, app_ok_genl = importer_apps()
+    tous = {}
+    for n in args.tailles:
+        tous[str(n)] = bench_taille(n, app, app_ok_genl, args.max_excel)
+        afficher(n, tous[str(n)], reference)
+
+    if args.enregistrer:
+        with open(args.enregistrer, 'w', encoding='utf-8') as f:
+            json.dump(tous, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+# Compare le typage d'origine de l'extrait (pd.to_datetime avec inférence
+# dayfirst sur chaque cellule) au typage par schéma de donnees.typer (formats
+# explicites, une analyse par date distincte), sur des extraits synthétiques.
+#   python bench/bench_typage.py --tailles 10000 100000 1000000
+import argparse
+import os
+import sys
+import timeit
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from donnees import COLONNES_DATES, COLONNES_MONTANTS, typer  # noqa: E402
+from generer import generer  # noqa: E402
+
+
+def ancien(df):
+    # Code d'origine de donnees.typer
+    df.columns = df.columns.str.strip()
+    for col in COLONNES_DATES:
+        df[col] = pd.to_datetime(df[col], dayfirst=True, errors='coerce')
+    for col in COLONNES_MONTANTS:
+        df[col] = pd.to_numeric(df[col], errors='coerce')
+    df['duree_garantie'] = (df['date d echeance'] - df['date de mise en place']).dt.days
+    return df
+
+
+def identiques(a, b):
+    colonnes = COLONNES_DATES + COLONNES_MONTANTS
+    return a[colonnes].astype(b[colonnes].dtypes).equals(b[colonnes])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--tailles', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--repetitions', type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'lignes':>10s} {'ancien (ms)':>12s} {'schéma (ms)':>12s} {'gain':>6s}")
+    for n in args.tailles:
+        brut = generer(n)
+        assert identiques(ancien(brut.copy()), typer(brut.copy()))
+        t_ancien = min(timeit.repeat(lambda: ancien(brut.copy()), number=1, repeat=args.repetitions))
+        t_schema = min(timeit.repeat(lambda: typer(brut.copy()), number=1, repeat=args.repetitions))
+        print(f"{n:10d} {t_ancien * 1000:12.1f} {t_schema * 1000:12.1f} {t_ancien / t_schema:5.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+# Génère un portefeuille de délégations synthétique avec le schéma exact de
+# l'extrait data/delegation0.xlsx.
+#   python bench/generer.py 100000 data/synthetique.xlsx [--clients N] [--garants N] [--natures N]
+import argparse
+
+import numpy as np
+import pandas as pd
+
+SEGMENTS = ['Corporate', 'Grandes Entreprises', 'PME', 'Institutionnels']
+SITUATIONS = ['Active', 'Expirée', 'Résiliée']
+PROBA_SITUATIONS = [0.6, 0.3, 0.1]
+
+
+def _dates(jours, manquants, rng):
+    # Dates au format texte jj/mm/aaaa, comme dans l'extrait, avec une part de
+    # cellules vides
+    dates = pd.Series(pd.Timestamp('1970-01-01') + pd.to_timedelta(jours, unit='D'))
+    return dates.dt.strftime('%d/%m/%Y').where(rng.random(len(jours)) >= manquants, None)
+
+
+def generer(n, nb_clients=None, nb_garants=25, nb_natures=12, manquants=0.01, seed=0):
+    rng = np.random.default_rng(seed)
+    nb_clients = nb_clients or max(n // 5, 1)
+    aujourd_hui = (pd.Timestamp.today().normalize() - pd.Timestamp('1970-01-01')).days
+
+    client = rng.integers(0, nb_clients, n)
+    mise_en_place = aujourd_hui - rng.integers(0, 3650, n)
+    echeance = mise_en_place + rng.integers(30, 1800, n)
+    saisie = mise_en_place - rng.integers(0, 60, n)
+    reevaluation = mise_en_place + (rng.random(n) * (aujourd_hui - mise_en_place)).astype('int64')
+    maturite = echeance + rng.integers(0, 365, n)
+    montant = rng.lognormal(13, 1.2, n).round(2)
+
+    codes_clients = np.array([f"C{i:07d}" for i in range(nb_clients)])
+    noms_clients = np.array([f"Client {i}" for i in range(nb_clients)])
+    return pd.DataFrame({
+        'code client': codes_clients[client],
+        'nom client': noms_clients[client],
+        'libelle nature': rng.choice([f"Nature {i}" for i in range(nb_natures)], n),
+        'nom garant': rng.choice([f"Garant {i}" for i in range(nb_garants)], n),
+        'libelle segment': rng.choice(SEGMENTS, n),
+        'situationde la garantie': rng.choice(SITUATIONS, n, p=PROBA_SITUATIONS),
+        'montant de la garantie': montant,
+        'montant engagement couvert actualisé': (montant * rng.uniform(1, 2.5, n)).round(2),
+        'date de mise en place': _dates(mise_en_place, manquants, rng),
+        'date d echeance': _dates(echeance, manquants, rng),
+        'date de saisie': _dates(saisie, manquants, rng),
+        'date de derniere reevaluation': _dates(reevaluation, manquants, rng),
+        'date de maturite de l engagement': _dates(maturite, manquants, rng),
+    })
+
+
+def ecrire(df, chemin):
+    if chemin.endswith('.xlsx'):
+        df.to_excel(chemin, sheet_name='Sheet1', index=False)
+    elif chemin.endswith('.csv'):
+        df.to_csv(chemin, index=False)
+    else:
+        df.to_parquet(chemin, index=False)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('lignes', type=int)
+    parser.add_argument('sortie')
+    parser.add_argument('--clients', type=int)
+    parser.add_argument('--garants', type=int, default=25)
+    parser.add_argument('--natures', type=int, default=12)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    ecrire(generer(args.lignes, args.clients, args.garants, args.natures, seed=args.seed), args.sortie)
@@ -0,0 +1,136 @@
+import json
+import logging
+import threading
+from collections import OrderedDict
+from datetime import date
+
+import plotly
+
+logger = logging.getLogger(__name__)
+
+
+def normaliser_filtres(*filtres):
+    # [b, a] et [a, b] (ou None et []) doivent tomber sur la même entrée
+    return tuple(tuple(sorted(set(f))) if f else () for f in filtres)
+
+
+def taille_rendu(valeur):
+    # Taille du JSON que Dash enverra au navigateur pour ce rendu
+    return len(json.dumps(valeur, cls=plotly.utils.PlotlyJSONEncoder))
+
+
+# Taille du dernier rendu servi par un CacheRendu dans ce thread : la mesure
+# des réponses (metriques.instrumenter_callback) la reprend au lieu de
+# resérialiser le rendu
+_servi = threading.local()
+
+
+def taille_servie():
+    # Lue une seule fois : None si aucun rendu n'a été servi depuis
+    return _servi.__dict__.pop('taille', None)
+
+
+class _Vol:
+    # Calcul en cours pour une clé : les requêtes identiques qui arrivent
+    # pendant le calcul attendent son résultat au lieu de le refaire
+    def __init__(self):
+        self.termine = threading.Event()
+        self.valeur = None
+        self.taille = None
+        self.erreur = None
+
+
+class CacheRendu:
+    # LRU borné en octets sur les rendus d'onglets. La date du jour fait partie
+    # de la clé et le cache est vidé au premier accès après minuit, les
+    # indicateurs à fenêtre glissante (échéances 3 mois, 30 jours...) changeant
+    # avec la date.
+    # Un seul calcul par clé à la fois (single-flight) : les demandes
+    # concurrentes d'une clé absente partagent le calcul en cours.
+    def __init__(self, taille_max=64 * 1024 * 1024):
+        self.taille_max = taille_max
+        self.taille = 0
+        self.hits = 0
+        self.misses = 0
+        self.partages = 0
+        self._entrees = OrderedDict()
+        self._vols = {}
+        self._jour = date.today()
+        self._verrou = threading.Lock()
+
+    def vider(self):
+        with self._verrou:
+            self._entrees.clear()
+            self.taille = 0
+
+    def _controler_jour(self):
+        aujourd_hui = date.today()
+        if aujourd_hui != self._jour:
+            self._entrees.clear()
+            self.taille = 0
+            self._jour = aujourd_hui
+
+    def obtenir(self, cle, calcul):
+        cle = cle + (date.today(),)
+        with self._verrou:
+            self._controler_jour()
+            if cle in self._entrees:
+                self._entrees.move_to_end(cle)
+                self.hits += 1
+                valeur, _servi.taille = self._entrees[cle]
+                return valeur
+            vol = self._vols.get(cle)
+            if vol is None:
+                vol = self._vols[cle] = _Vol()
+                self.misses += 1
+                meneur = True
+            else:
+                self.partages += 1
+                meneur = False
+
+        if not meneur:
+            vol.termine.wait()
+            if vol.erreur is not None:
+                raise vol.erreur
+            _servi.taille = vol.taille
+            return vol.valeur
+
+        # Le résultat est rangé dans le cache avant la fin du vol, sous le même
+        # verrou : une requête qui arrive entre les deux trouve l'un ou l'autre
+        taille = None
+        try:
+            vol.valeur = calcul()
+            vol.taille = taille = taille_rendu(vol.valeur)
+        except BaseException as exc:
+            vol.erreur = exc
+            raise
+        finally:
+            with self._verrou:
+                if vol.erreur is None and taille <= self.taille_max:
+                    self._ranger(cle, vol.valeur, taille)
+                del self._vols[cle]
+            vol.termine.set()
+        _servi.taille = taille
+        return vol.valeur
+
+    def _ranger(self, cle, valeur, taille):
+        # Appelé sous self._verrou
+        if cle not in self._entrees:
+            self._entrees[cle] = (valeur, taille)
+            self.taille += taille
+        while self.taille > self.taille_max:
+            _, (_, taille_evincee) = self._entrees.popitem(last=False)
+            self.taille -= taille_evincee
+
+    def stats(self):
+        with self._verrou:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'partages': self.partages,
+                'taux_hit': self.hits / total if total else 0.0,
+                'entrees': len(self._entrees),
+                'taille': self.taille,
+                'taille_max': self.taille_max,
+            }
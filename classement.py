@@ -0,0 +1,118 @@
+import numpy as np
+import pandas as pd
+
+# Classements des clients (nombre de garanties, montant garanti) : agrégats par
+# client précalculés au chargement pour chaque valeur de chaque dimension
+# filtrable, puis top n par sélection partielle (argpartition) au lieu d'un
+# groupby et d'un tri complets à chaque clic. Les agrégats sont creux (seuls
+# les couples valeur / client présents sont gardés) : la mémoire suit le
+# nombre de lignes, pas valeurs × clients.
+TOP = 10
+MESURES = ('nb', 'montant')
+
+
+def _dimensions(df):
+    # Mêmes valeurs que les bitmaps de IndexFiltres (type, assureur, année)
+    return {
+        'libelle nature': df['libelle nature'],
+        'nom garant': df['nom garant'],
+        'annee': df['date de mise en place'].dt.year,
+    }
+
+
+def _par_valeur(codes_valeur, nb_valeurs, clients, poids):
+    # Sommes par couple (valeur, client) au format CSR : clients et sommes
+    # rangés par valeur, debuts[v]:debuts[v + 1] délimitant la tranche de v
+    connus = codes_valeur >= 0
+    couples = pd.DataFrame({'valeur': codes_valeur[connus], 'client': clients[connus],
+                            **{mesure: p[connus] for mesure, p in poids.items()}})
+    couples = couples.groupby(['valeur', 'client'], sort=True)[list(poids)].sum().reset_index()
+    debuts = np.searchsorted(couples['valeur'].to_numpy(), np.arange(nb_valeurs + 1))
+    return debuts, couples['client'].to_numpy(), {mesure: couples[mesure].to_numpy() for mesure in poids}
+
+
+class Classement:
+    def __init__(self, df, index_clients):
+        clients = index_clients.codes
+        connus = clients >= 0
+        self.nb_clients = index_clients.nb_clients
+        # Codes client en texte, convertis une fois (départage des égalités)
+        self.codes = np.asarray(index_clients.valeurs.astype(str), dtype=object)
+        # Nom affiché : le premier nom rencontré pour chaque code client
+        premiere = index_clients.ordre[index_clients.debuts[:-1]]
+        self.noms = df['nom client'].astype(object).to_numpy()[premiere]
+
+        poids = {
+            'nb': np.ones(len(df)),
+            'montant': df['montant de la garantie'].to_numpy(dtype='float64', na_value=np.nan),
+        }
+        poids['montant'] = np.where(np.isnan(poids['montant']), 0, poids['montant'])
+
+        # Cellules (type, assureur, année, client) : utilisées quand plusieurs
+        # dimensions sont filtrées à la fois
+        self.dimensions = {}
+        cellules = {}
+        for dimension, serie in _dimensions(df).items():
+            codes_valeur, valeurs = pd.factorize(serie)
+            self.dimensions[dimension] = (pd.Index(valeurs),
+                                          _par_valeur(codes_valeur[connus], len(valeurs), clients[connus], {
+                                              mesure: p[connus] for mesure, p in poids.items()}))
+            cellules[dimension] = codes_valeur[connus]
+        cellules['client'] = clients[connus]
+        cellules.update({mesure: p[connus] for mesure, p in poids.items()})
+        self.cellules = pd.DataFrame(cellules).groupby(
+            [*self.dimensions, 'client'], sort=False)[list(MESURES)].sum().reset_index()
+
+        self.totaux = {mesure: np.bincount(clients[connus], weights=p[connus], minlength=self.nb_clients)
+                       for mesure, p in poids.items()}
+
+    def _positions(self, dimension, valeurs):
+        positions = self.dimensions[dimension][0].get_indexer(list(valeurs))
+        return positions[positions >= 0]
+
+    def agregats(self, type_filter=None, assur_filter=None, year_filter=None):
+        # Nombre et montant par client (tableaux alignés sur self.codes) pour
+        # la sélection
+        filtres = {dimension: valeurs for dimension, valeurs
+                   in zip(self.dimensions, (type_filter, assur_filter, year_filter)) if valeurs}
+        if not filtres:
+            return self.totaux
+        if len(filtres) == 1:
+            # Une seule dimension filtrée : tranches des valeurs retenues
+            (dimension, valeurs), = filtres.items()
+            debuts, clients, sommes = self.dimensions[dimension][1]
+            tranches = np.concatenate([np.arange(debuts[i], debuts[i + 1])
+                                       for i in self._positions(dimension, valeurs)] or [np.empty(0, dtype='int64')])
+            return {mesure: np.bincount(clients[tranches], weights=sommes[mesure][tranches],
+                                        minlength=self.nb_clients)
+                    for mesure in MESURES}
+        masque = np.ones(len(self.cellules), dtype=bool)
+        for dimension, valeurs in filtres.items():
+            masque &= np.isin(self.cellules[dimension].to_numpy(), self._positions(dimension, valeurs))
+        retenues = self.cellules[masque]
+        clients = retenues['client'].to_numpy()
+        return {mesure: np.bincount(clients, weights=retenues[mesure].to_numpy(), minlength=self.nb_clients)
+                for mesure in MESURES}
+
+    def top(self, mesure, n=TOP, type_filter=None, assur_filter=None, year_filter=None):
+        # Les n clients les plus forts pour mesure ('nb' ou 'montant'), parmi
+        # les clients ayant au moins une garantie dans la sélection
+        agregats = self.agregats(type_filter, assur_filter, year_filter)
+        presents = np.flatnonzero(agregats['nb'] > 0)
+        valeurs = agregats[mesure][presents]
+        if len(presents) > n:
+            # argpartition donne la n-ième valeur ; à égalité sur ce seuil, les
+            # plus petits codes client sont retenus pour un résultat stable
+            seuil = valeurs[np.argpartition(-valeurs, n - 1)[n - 1]]
+            egaux = np.flatnonzero(valeurs == seuil)
+            egaux = egaux[np.argsort(self.codes[presents[egaux]], kind='stable')]
+            au_dessus = np.flatnonzero(valeurs > seuil)
+            tete = np.concatenate([au_dessus, egaux[:n - len(au_dessus)]])
+        else:
+            tete = np.arange(len(presents))
+        # Ordre décroissant, puis par code client à valeur égale
+        tete = tete[np.lexsort((self.codes[presents[tete]], -valeurs[tete]))]
+        retenus = presents[tete]
+        valeurs = agregats[mesure][retenus]
+        return pd.DataFrame({'code client': self.codes[retenus], 'nom client': self.noms[retenus],
+                             mesure: valeurs.astype('int64') if mesure == 'nb' else valeurs})
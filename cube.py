@@ -0,0 +1,97 @@
+import numpy as np
+import pandas as pd
+
+# Dimensions sur lesquelles portent les filtres du tableau de bord : elles sont
+# présentes dans chaque cuboïde pour pouvoir y appliquer la sélection.
+DIMENSIONS_FILTRES = ['libelle nature', 'nom garant', 'annee']
+
+# Dimensions d'analyse : un cuboïde (filtres + dimension) par axe de graphique
+DIMENSIONS_ANALYSE = ['situationde la garantie', 'libelle segment', 'mois mise en place',
+                      'mois echeance', 'tranche']
+
+MESURES = ['nb', 'mt_somme', 'mt_nb', 'eng_somme', 'duree_somme', 'duree_nb',
+           'delai_somme', 'delai_nb']
+
+TRANCHES = [0, 1e6, 5e6, float('inf')]
+LIBELLES_TRANCHES = ['<1M', '1-5M', '>5M']
+
+
+def _colonnes_cube(df):
+    delai = (df['date de mise en place'] - df['date de saisie']).dt.days
+    return pd.DataFrame({
+        'libelle nature': df['libelle nature'],
+        'nom garant': df['nom garant'],
+        'annee': df['date de mise en place'].dt.year,
+        'situationde la garantie': df['situationde la garantie'],
+        'libelle segment': df['libelle segment'],
+        'mois mise en place': df['date de mise en place'].dt.to_period('M'),
+        'mois echeance': df['date d echeance'].dt.to_period('M'),
+        'tranche': pd.cut(df['montant de la garantie'], bins=TRANCHES, labels=LIBELLES_TRANCHES),
+        'nb': 1,
+        'mt_somme': df['montant de la garantie'].fillna(0),
+        'mt_nb': df['montant de la garantie'].notna().astype('int64'),
+        'eng_somme': df['montant engagement couvert actualisé'].fillna(0),
+        'duree_somme': df['duree_garantie'].fillna(0),
+        'duree_nb': df['duree_garantie'].notna().astype('int64'),
+        'delai_somme': delai.fillna(0),
+        'delai_nb': delai.notna().astype('int64'),
+    })
+
+
+def _cellules(base, dimensions):
+    # dropna=False : une ligne sans assureur ou sans date compte quand même dans
+    # les totaux non filtrés, comme dans le DataFrame d'origine
+    return base.groupby(dimensions, dropna=False, observed=True)[MESURES].sum().reset_index()
+
+
+class Cube:
+    # Agrégats précalculés une fois par chargement. Les indicateurs des onglets
+    # se calculent ensuite sur quelques centaines de cellules au lieu des lignes.
+    def __init__(self, df):
+        base = _colonnes_cube(df)
+        self.cuboides = {None: _cellules(base, DIMENSIONS_FILTRES)}
+        for dimension in DIMENSIONS_ANALYSE:
+            self.cuboides[dimension] = _cellules(base, DIMENSIONS_FILTRES + [dimension])
+
+        # Ensemble exact des clients de chaque cellule filtrable (repérée par sa
+        # position dans le cuboïde de base) : l'union de quelques ensembles donne
+        # le nombre de clients distincts sans repasser sur les lignes.
+        cellule = base.groupby(DIMENSIONS_FILTRES, dropna=False, observed=True).ngroup().to_numpy()
+        codes, _ = pd.factorize(df['code client'])
+        connus = codes >= 0
+        clients = pd.Series(codes[connus]).groupby(cellule[connus]).unique()
+        self.clients = [clients.get(i, np.empty(0, dtype=codes.dtype))
+                        for i in range(len(self.cuboides[None]))]
+
+    def filtrer(self, type_filter=None, assur_filter=None, year_filter=None):
+        return VueCube(self, (type_filter, assur_filter, year_filter))
+
+
+class VueCube:
+    def __init__(self, cube, filtres):
+        self.cube = cube
+        self.filtres = filtres
+
+    def _selection(self, cellules):
+        masque = np.ones(len(cellules), dtype=bool)
+        for dimension, valeurs in zip(DIMENSIONS_FILTRES, self.filtres):
+            if valeurs:
+                masque &= cellules[dimension].isin(valeurs).to_numpy()
+        return cellules[masque]
+
+    def totaux(self):
+        return self._selection(self.cube.cuboides[None])[MESURES].sum()
+
+    def par(self, dimension):
+        # Agrégats par valeur de la dimension (valeurs manquantes exclues,
+        # comme dans les graphiques calculés sur les lignes)
+        cuboide = None if dimension in DIMENSIONS_FILTRES else dimension
+        cellules = self._selection(self.cube.cuboides[cuboide])
+        return cellules.groupby(dimension, observed=True)[MESURES].sum().reset_index()
+
+    def nb_clients(self):
+        cellules = self._selection(self.cube.cuboides[None])
+        ensembles = [self.cube.clients[i] for i in cellules.index]
+        if not ensembles:
+            return 0
+        return len(np.unique(np.concatenate(ensembles)))
@@ -0,0 +1,672 @@
+import glob
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import classement
+import ingestion
+import partage
+import precalcul
+import schema
+from cube import Cube
+from index_clients import IndexClients
+from index_dates import COLONNES_FENETRES, IndexDate
+from index_filtres import IndexFiltres, selectionner
+from index_intervalles import IndexIntervalles
+from partitions import PartitionsGarant
+
+logger = logging.getLogger(__name__)
+
+# Un fichier, un motif glob ou un répertoire : chaque agence produit son
+# propre delegationN.xlsx, le portefeuille est la réunion de tous les extraits
+SOURCE = os.environ.get('DELEGATION_SOURCE', 'data/delegation*.xlsx')
+EXTENSIONS = ('.xlsx', '.xlsm', '.csv')
+
+# Nombre de processus pour relire les extraits modifiés
+PROCESSUS = int(os.environ.get('DELEGATION_PROCESSUS', 0)) or os.cpu_count() or 1
+
+# Mode partagé (gunicorn) : si DELEGATION_PARTAGE désigne un répertoire, les
+# workers mappent la version publiée par le processus maître (voir
+# gunicorn.conf.py) au lieu de relire l'extrait chacun de leur côté.
+PARTAGE = os.environ.get('DELEGATION_PARTAGE')
+
+# Types des colonnes de l'extrait : voir schema.SCHEMA
+COLONNES_DATES = schema.colonnes('date')
+
+
+# Extrait d'origine de chaque ligne (nom du fichier)
+COLONNE_SOURCE = 'fichier_source'
+
+# Situation de l'engagement (colonne facultative, absente des extraits
+# actuels) : sans elle les engagements en défaut ne sont pas calculables
+COLONNE_SITUATION_ENGAGEMENT = 'situation de l engagement'
+
+# Colonnes texte répétées d'une ligne à l'autre : stockées en catégories
+COLONNES_CATEGORIES = ['libelle nature', 'nom garant', 'libelle segment', 'situationde la garantie',
+                       'nom client', 'code client', COLONNE_SOURCE, COLONNE_SITUATION_ENGAGEMENT]
+
+# Montants sommés par les indicateurs : gardés en float64 pour que les totaux
+# affichés restent identiques au centime près
+COLONNES_MONTANTS = schema.colonnes('montant')
+
+# Colonnes des filtres du tableau de bord : leurs valeurs distinctes sont
+# enregistrées à côté de chaque snapshot (options des listes déroulantes)
+COLONNES_OPTIONS = ['libelle nature', 'nom garant', 'date de mise en place']
+
+# Version du format des snapshots parquet : un snapshot d'un autre format est
+# reconstruit depuis la source
+FORMAT_SNAPSHOT = 5
+
+
+def _memoire(df):
+    return df.memory_usage(deep=True).sum()
+
+
+def compacter(df, seuil_categorie=0.5):
+    # Types compacts sans perte : catégories pour les textes peu variés, entiers
+    # et flottants réduits quand l'aller-retour conserve toutes les valeurs.
+    avant = _memoire(df)
+    df = df.copy()
+    for col in df.columns:
+        serie = df[col]
+        if serie.dtype == object:
+            if col in COLONNES_CATEGORIES or serie.nunique() < seuil_categorie * len(serie):
+                df[col] = serie.astype('category')
+        elif pd.api.types.is_integer_dtype(serie.dtype):
+            df[col] = pd.to_numeric(serie, downcast='integer')
+        elif pd.api.types.is_float_dtype(serie.dtype) and col not in COLONNES_MONTANTS:
+            valeurs = serie.dropna().to_numpy()
+            if (valeurs == valeurs.round()).all() and np.abs(valeurs).max(initial=0) < 2 ** 31:
+                df[col] = serie.astype('Int32')
+            elif serie.astype('float32').astype(serie.dtype).equals(serie):
+                df[col] = serie.astype('float32')
+    apres = _memoire(df)
+    logger.info("Mémoire du portefeuille : %.1f Mo -> %.1f Mo (%.0f%%)",
+                avant / 1e6, apres / 1e6, 100 * apres / avant if avant else 100)
+    return df
+
+
+def lire_excel(chemin):
+    # Chargement des données
+    return preparer(pd.read_excel(chemin, sheet_name='Sheet1'))
+
+
+def typer(df, rapport=None):
+    # Extrait brut -> colonnes typées : noms nettoyés, dates, montants et
+    # situations validés selon schema.SCHEMA, durée calculée. S'applique
+    # aussi bien à un bloc qu'au fichier ; les cellules rejetées vont au
+    # rapport (journalisé ici s'il n'y en a pas).
+    df.columns = df.columns.str.strip()
+    rapport_local = rapport is None
+    rapport = schema.Rapport() if rapport_local else rapport
+    schema.appliquer(df, rapport)
+    if rapport_local:
+        rapport.journaliser("Extrait")
+
+    # Durée inconnue plutôt que négative quand l'échéance précède la mise en
+    # place (signalé au rapport) : elle fausserait la durée moyenne
+    duree = (df['date d echeance'] - df['date de mise en place']).dt.days
+    df['duree_garantie'] = duree.where(~(duree < 0))
+    return df
+
+
+def preparer(df):
+    # Extrait brut -> portefeuille typé et compacté
+    return compacter(typer(df))
+
+
+def _empreinte(chemin):
+    h = hashlib.sha1()
+    with open(chemin, 'rb') as f:
+        for bloc in iter(lambda: f.read(1 << 20), b''):
+            h.update(bloc)
+    return h.hexdigest()
+
+
+def _chemins_snapshot(chemin):
+    rep = os.path.join(os.path.dirname(chemin) or '.', '.cache')
+    # Le nom du snapshot garde l'extension : delegation1.xlsx et delegation1.csv
+    # ont chacun le leur
+    nom = os.path.basename(chemin)
+    return rep, os.path.join(rep, nom + '.parquet'), os.path.join(rep, nom + '.json')
+
+
+def _chemin_rejets(meta_path):
+    # Rapport des cellules rejetées, à côté du snapshot (delegation0.xlsx.rejets.csv)
+    return os.path.splitext(meta_path)[0] + '.rejets.csv'
+
+
+def _snapshot_valide(chemin, meta_path):
+    # La clé du snapshot est (mtime, taille) du fichier source ; si elle a bougé
+    # on recalcule l'empreinte avant de conclure (fichier recopié, touch...).
+    try:
+        with open(meta_path, encoding='utf-8') as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return False
+    if meta.get('format') != FORMAT_SNAPSHOT:
+        return False
+
+    stat = os.stat(chemin)
+    a_jour = meta.get('mtime') == stat.st_mtime_ns and meta.get('taille') == stat.st_size
+    if not a_jour:
+        if meta.get('sha1') != _empreinte(chemin):
+            return False
+        meta.update(mtime=stat.st_mtime_ns, taille=stat.st_size)
+    if 'options' not in meta:
+        # Snapshot antérieur aux options des filtres : complété sur place
+        meta['options'] = _options(pd.read_parquet(os.path.splitext(meta_path)[0] + '.parquet',
+                                                    columns=COLONNES_OPTIONS))
+    elif a_jour:
+        return True
+    _ecrire_meta(meta_path, meta)
+    return True
+
+
+def _ecrire_meta(meta_path, meta):
+    # Écriture atomique (fichier temporaire propre au processus puis rename) :
+    # un autre worker ne lit jamais de métadonnées tronquées
+    tmp = f'{meta_path}.{os.getpid()}.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+    os.replace(tmp, meta_path)
+
+
+def _ecrire_snapshot(chemin, rep, snapshot, meta_path):
+    # Le snapshot est écrit bloc par bloc depuis la source (ingestion en flux),
+    # sous un nom temporaire renommé à la fin : un autre worker ne peut jamais
+    # lire un snapshot à moitié écrit.
+    os.makedirs(rep, exist_ok=True)
+    stat = os.stat(chemin)
+    meta = {'source': os.path.abspath(chemin), 'mtime': stat.st_mtime_ns,
+            'taille': stat.st_size, 'sha1': _empreinte(chemin), 'format': FORMAT_SNAPSHOT}
+
+    rapport = schema.Rapport()
+    ingestion.ingerer(chemin, snapshot, lambda bloc: typer(bloc, rapport))
+    rapport.journaliser(chemin)
+    rapport.ecrire(_chemin_rejets(meta_path))
+    meta['rejets'] = rapport.resume()
+    meta['options'] = _options(pd.read_parquet(snapshot, columns=COLONNES_OPTIONS))
+    _ecrire_meta(meta_path, meta)
+
+
+def _options(df):
+    # Valeurs proposées par les filtres type / assureur / année
+    return {
+        'libelle nature': sorted(str(v) for v in df['libelle nature'].dropna().unique()),
+        'nom garant': sorted(str(v) for v in df['nom garant'].dropna().unique()),
+        'annee': sorted(int(v) for v in df['date de mise en place'].dt.year.dropna().unique()),
+    }
+
+
+def _options_cube(cube):
+    # Mêmes valeurs lues dans les cellules du cube (quelques centaines de lignes)
+    cellules = cube.cuboides[None]
+    return {
+        'libelle nature': sorted(str(v) for v in cellules['libelle nature'].dropna().unique()),
+        'nom garant': sorted(str(v) for v in cellules['nom garant'].dropna().unique()),
+        'annee': sorted(int(v) for v in cellules['annee'].dropna().unique()),
+    }
+
+
+def rejets(source=SOURCE):
+    # Nombre de cellules rejetées par extrait, colonne et motif (métadonnées
+    # des snapshots ; le détail est dans les fichiers .rejets.csv)
+    resultat = {}
+    for chemin in fichiers_sources(source):
+        try:
+            with open(_chemins_snapshot(chemin)[2], encoding='utf-8') as f:
+                resultat[os.path.basename(chemin)] = json.load(f).get('rejets', {})
+        except (OSError, ValueError):
+            resultat[os.path.basename(chemin)] = None
+    return resultat
+
+
+def options_snapshots(source=SOURCE):
+    # Options des filtres réunies depuis les métadonnées des snapshots ; None
+    # si un extrait n'a pas (ou plus) de snapshot à jour
+    fichiers = fichiers_sources(source)
+    if not fichiers:
+        return None
+    options = {'libelle nature': set(), 'nom garant': set(), 'annee': set()}
+    for chemin in fichiers:
+        _, snapshot, meta_path = _chemins_snapshot(chemin)
+        try:
+            with open(meta_path, encoding='utf-8') as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        stat = os.stat(chemin)
+        if 'options' not in meta or (meta.get('mtime'), meta.get('taille')) != (stat.st_mtime_ns, stat.st_size):
+            return None
+        for cle, valeurs in meta['options'].items():
+            options[cle].update(valeurs)
+    return {cle: sorted(valeurs) for cle, valeurs in options.items()}
+
+
+def fichiers_sources(source=SOURCE):
+    # Extraits désignés par source (fichier, motif glob ou répertoire), triés
+    if os.path.isdir(source):
+        motifs = [os.path.join(source, '*' + ext) for ext in EXTENSIONS]
+    else:
+        motifs = [source]
+    fichiers = {f for motif in motifs for f in glob.glob(motif)}
+    # Fichiers verrous d'Excel (~$delegation1.xlsx) ignorés
+    return sorted(f for f in fichiers if os.path.isfile(f) and not os.path.basename(f).startswith('~$'))
+
+
+def _construire_snapshot(chemin):
+    # Exécuté dans un processus du pool
+    _ecrire_snapshot(chemin, *_chemins_snapshot(chemin))
+    return chemin
+
+
+def _contexte_processus():
+    # forkserver plutôt que fork : _snapshots est aussi appelée depuis les
+    # threads de surveillance et de minuit, et un fork d'un processus
+    # multithread peut hériter d'un verrou tenu par un autre thread. Le
+    # serveur est un interpréteur neuf qui précharge ce module ; chaque
+    # processus de lecture en est une copie. Le script principal y est
+    # réimporté une fois sous le nom __mp_main__ (sans préchargement, chaque
+    # processus le réimporterait) : il ne doit rien charger dans ce cas, voir
+    # PROCESSUS_PRINCIPAL dans app.py, app_ok_1.py et app_ok_genl.py.
+    contexte = multiprocessing.get_context('forkserver')
+    contexte.set_forkserver_preload(['__main__', __name__])
+    return contexte
+
+
+def _snapshots(fichiers):
+    # Snapshot de chaque extrait ; seuls les extraits modifiés sont relus, en
+    # parallèle s'il y en a plusieurs
+    a_construire = []
+    for chemin in fichiers:
+        rep, snapshot, meta_path = _chemins_snapshot(chemin)
+        if not (os.path.exists(snapshot) and _snapshot_valide(chemin, meta_path)):
+            a_construire.append(chemin)
+
+    if len(a_construire) > 1 and PROCESSUS > 1:
+        logger.info("Lecture de %d extraits sur %d processus", len(a_construire), PROCESSUS)
+        with ProcessPoolExecutor(max_workers=min(PROCESSUS, len(a_construire)),
+                                 mp_context=_contexte_processus()) as pool:
+            list(pool.map(_construire_snapshot, a_construire))
+    else:
+        for chemin in a_construire:
+            _construire_snapshot(chemin)
+    return [_chemins_snapshot(chemin)[1] for chemin in fichiers]
+
+
+def _lire_brut(chemin):
+    if os.path.splitext(chemin)[1].lower() == '.csv':
+        return pd.read_csv(chemin, sep=None, engine='python', dtype=str)
+    return pd.read_excel(chemin, sheet_name='Sheet1')
+
+
+def lire_sources(fichiers):
+    # Lecture en une fois, sans pyarrow ni snapshot
+    blocs = []
+    for chemin in fichiers:
+        rapport = schema.Rapport()
+        brut = typer(_lire_brut(chemin), rapport)
+        rapport.journaliser(chemin)
+        brut[COLONNE_SOURCE] = os.path.basename(chemin)
+        blocs.append(brut)
+    return compacter(pd.concat(blocs, ignore_index=True))
+
+
+def charger_donnees(source=SOURCE):
+    fichiers = fichiers_sources(source)
+    if not fichiers:
+        raise FileNotFoundError(f"Aucun extrait pour {source}")
+
+    try:
+        snapshots = _snapshots(fichiers)
+        df = compacter(ingestion.lire_parquet(snapshots, COLONNES_CATEGORIES, etiquette=COLONNE_SOURCE))
+    except ImportError:
+        logger.warning("pyarrow absent : lecture de %s en une fois, sans snapshot", source)
+        return lire_sources(fichiers)
+    except Exception as exc:
+        logger.warning("Snapshots de %s inutilisables (%s), lecture en une fois", source, exc)
+        return lire_sources(fichiers)
+    logger.info("Portefeuille chargé : %d lignes, %d extrait(s)", len(df), len(fichiers))
+    return df
+
+
+def _alertes(df, clients):
+    # Alertes qui ne dépendent pas du jour, positions calculées une fois par
+    # chargement. Une garantie expirée est renouvelée si le même client a une
+    # garantie mise en place après elle (jointure par l'index clients).
+    expirees = np.flatnonzero((df['situationde la garantie'] == 'Expirée').to_numpy())
+    alertes = {'expirees_non_renouvelees': expirees[~clients.renouvelees(expirees)]}
+    if COLONNE_SITUATION_ENGAGEMENT in df.columns:
+        situation = df[COLONNE_SITUATION_ENGAGEMENT].astype(str).str.lower()
+        alertes['engagements_defaut'] = np.flatnonzero(
+            situation.str.contains('défaut|defaut', regex=True).to_numpy())
+    else:
+        alertes['engagements_defaut'] = None
+    return alertes
+
+
+class Jeu:
+    # Photo immuable du portefeuille : on ne la modifie jamais en place, un
+    # rechargement construit un nouveau Jeu puis remplace la référence.
+    def __init__(self, df, version, source, identifiant=None):
+        self.df = df
+        self.index = IndexFiltres(df)
+        self.cube = Cube(df)
+        self.dates = {col: IndexDate(df[col]) for col in COLONNES_FENETRES}
+        self.clients = IndexClients(df)
+        self.alertes = _alertes(df, self.clients)
+        self.classement = classement.Classement(df, self.clients)
+        self.intervalles = IndexIntervalles(df)
+        self.garants = PartitionsGarant(df)
+        # Options des listes déroulantes : métadonnées des snapshots, à défaut
+        # (mode partagé, lecture sans pyarrow) les cellules du cube
+        self.options = None if PARTAGE else options_snapshots(source)
+        if self.options is None:
+            self.options = _options_cube(self.cube)
+        self.version = version
+        self.source = source
+        # Identifie les données elles-mêmes (signature des extraits ou version
+        # partagée) : identique d'un worker à l'autre, contrairement à version
+        self.identifiant = identifiant or f"{source}@{version}"
+        self.charge_le = time.time()
+        self._precalculs = None
+        self._precalculs_passes = OrderedDict()
+        self._verrou_precalculs = threading.Lock()
+
+    def precalculs(self, jour=None):
+        # Fenêtres du jour, recalculées au premier appel après minuit si le
+        # planificateur ne l'a pas déjà fait. Pour une autre date
+        # d'observation, calculées à la demande et gardées dans un petit LRU.
+        aujourd_hui = precalcul.aujourd_hui()
+        jour = aujourd_hui if jour is None else jour
+        with self._verrou_precalculs:
+            if jour == aujourd_hui:
+                if self._precalculs is None or self._precalculs.jour != jour:
+                    self._precalculs = precalcul.Precalculs(self, jour)
+                return self._precalculs
+            if jour in self._precalculs_passes:
+                self._precalculs_passes.move_to_end(jour)
+            else:
+                self._precalculs_passes[jour] = precalcul.Precalculs(self, jour)
+                while len(self._precalculs_passes) > precalcul.JOURS_EN_CACHE:
+                    self._precalculs_passes.popitem(last=False)
+            return self._precalculs_passes[jour]
+
+    def selection(self, type_filter=None, assur_filter=None, year_filter=None, jour=None):
+        # jour : date d'observation (minuit) des indicateurs relatifs au jour,
+        # aujourd'hui par défaut
+        return Selection(self, type_filter, assur_filter, year_filter, jour)
+
+
+class Selection:
+    # Lignes retenues par les filtres du tableau de bord dans un Jeu donné. Le
+    # DataFrame filtré n'est matérialisé que si une fonction de rendu en a besoin.
+    def __init__(self, jeu, type_filter, assur_filter, year_filter, jour=None):
+        self.jeu = jeu
+        self.filtres = (type_filter, assur_filter, year_filter)
+        self.jour = precalcul.aujourd_hui() if jour is None else jour
+        self.masque = jeu.index.masque(*self.filtres)
+        self.vue = jeu.cube.filtrer(*self.filtres)
+        self._dff = None
+        self._intervalles = None
+
+    @property
+    def dff(self):
+        if self._dff is None:
+            self._dff = selectionner(self.jeu.df, self.jeu.index, *self.filtres)
+        return self._dff
+
+    @property
+    def nb_lignes(self):
+        return len(self.jeu.df) if self.masque is None else int(self.masque.sum())
+
+    def lignes(self, colonne, debut=None, fin=None):
+        # Lignes filtrées dont la date est dans [debut, fin], via l'index trié
+        return self.jeu.df.iloc[self.jeu.dates[colonne].fenetre(debut, fin, self.masque)]
+
+    def compter(self, colonne, debut=None, fin=None):
+        return self.jeu.dates[colonne].compter(debut, fin, self.masque)
+
+    def precalculs(self):
+        return self.jeu.precalculs(self.jour)
+
+    @property
+    def intervalles(self):
+        # Index des périodes de validité restreint aux filtres
+        if self._intervalles is None:
+            self._intervalles = self.jeu.intervalles.restreindre(self.masque)
+        return self._intervalles
+
+    def actives_au(self, jour=None):
+        # Nombre et montant des garanties en cours de validité au jour donné
+        # (jour d'observation par défaut)
+        return self.intervalles.actives(self.jour if jour is None else jour)
+
+    def _garants_seuls(self):
+        type_filter, assur_filter, year_filter = self.filtres
+        return assur_filter and not type_filter and not year_filter
+
+    def fenetre(self, nom):
+        # Positions des lignes filtrées dans la fenêtre précalculée nom
+        lignes = self.precalculs().lignes[nom]
+        return lignes if self.masque is None else lignes[self.masque[lignes]]
+
+    def lignes_fenetre(self, nom):
+        return self.jeu.df.iloc[self.fenetre(nom)]
+
+    def compter_fenetre(self, nom):
+        if self.masque is None:
+            return len(self.precalculs().lignes[nom])
+        if self._garants_seuls():
+            return int(self.par_garant_fenetre(nom)['nb'].sum())
+        return len(self.fenetre(nom))
+
+    def par_garant_fenetre(self, nom):
+        # Nombre et montant par assureur dans la fenêtre nom ; sans filtre ou
+        # avec le seul filtre assureur, lus dans les partitions précalculées
+        par_garant = self.precalculs().par_garant[nom]
+        if self.masque is None:
+            return par_garant
+        if self._garants_seuls():
+            return par_garant[par_garant.index.isin(self.filtres[1])]
+        return self.lignes_fenetre(nom).groupby('nom garant', observed=True).agg(
+            nb=('nom garant', 'size'), montant=('montant de la garantie', 'sum'))
+
+    def resume_garants(self):
+        # Nombre et montants (nb, montant, engagement) par assureur ; sans
+        # filtre ou avec le seul filtre assureur, lus dans les résumés des
+        # partitions (qui ont aussi les situations et les clients)
+        resume = self.jeu.garants.resume
+        if self.masque is None:
+            return resume
+        if self._garants_seuls():
+            return resume[resume.index.isin(self.filtres[1])]
+        par_garant = self.vue.par('nom garant').set_index('nom garant')
+        par_garant.index = par_garant.index.astype(str)
+        return pd.DataFrame({'nb': par_garant['nb'], 'montant': par_garant['mt_somme'],
+                             'engagement': par_garant['eng_somme']})
+
+    def lignes_garant(self, garant):
+        # Positions des lignes filtrées d'un assureur, lues dans sa partition
+        lignes = self.jeu.garants.lignes(garant)
+        return lignes if self.masque is None else lignes[self.masque[lignes]]
+
+    def fenetre_garant(self, nom, garant):
+        return self.jeu.garants.restreindre(self.fenetre(nom), garant)
+
+    def top_clients(self, mesure, n=None):
+        # Top n des clients ('nb' ou 'montant') lu dans les agrégats par client
+        n = n or classement.TOP
+        return self.jeu.classement.top(mesure, n, *self.filtres)
+
+    def alerte(self, nom):
+        # Positions filtrées de l'alerte nom (voir _alertes et Precalculs),
+        # None si elle n'est pas calculable sur cet extrait
+        lignes = self.jeu.alertes[nom] if nom in self.jeu.alertes else self.precalculs().alertes[nom]
+        if lignes is None or self.masque is None:
+            return lignes
+        return lignes[self.masque[lignes]]
+
+
+_verrou = threading.Lock()
+_courant = None
+_abonnes = []
+
+
+def jeu_courant():
+    return _courant
+
+
+def _apres_fork():
+    # Un processus fils (callback d'arrière-plan) hérite des verrous dans l'état
+    # où le fork les a trouvés : un thread du parent pouvait les tenir.
+    global _verrou
+    _verrou = threading.Lock()
+    if _courant is not None:
+        _courant._verrou_precalculs = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_apres_fork)
+
+
+def abonner(fonction):
+    # fonction(jeu) est appelée après chaque (re)chargement réussi
+    _abonnes.append(fonction)
+
+
+def _publier(jeu):
+    global _courant
+    with _verrou:
+        _courant = jeu
+    for fonction in list(_abonnes):
+        try:
+            fonction(jeu)
+        except Exception:
+            logger.exception("Erreur dans l'abonné %r", fonction)
+
+
+def _identifiant(chemin):
+    # Lu avant le chargement : si la source change pendant la lecture, le
+    # rechargement suivant portera le nouvel identifiant
+    if PARTAGE:
+        try:
+            with open(partage.pointeur(PARTAGE), encoding='utf-8') as f:
+                return 'partage:' + f.read().strip()
+        except OSError:
+            return None
+    signature = _signature(chemin)
+    if signature is None:
+        return None
+    return hashlib.sha1(repr(signature).encode('utf-8')).hexdigest()
+
+
+def _lire(chemin):
+    if PARTAGE:
+        return partage.ouvrir(PARTAGE)
+    return charger_donnees(chemin)
+
+
+def initialiser(chemin=SOURCE):
+    identifiant = _identifiant(chemin)
+    jeu = Jeu(_lire(chemin), 1, chemin, identifiant)
+    _publier(jeu)
+    return jeu
+
+
+def recharger(chemin=SOURCE):
+    ancien = _courant
+    debut = time.perf_counter()
+    identifiant = _identifiant(chemin)
+    df = _lire(chemin)
+    jeu = Jeu(df, ancien.version + 1 if ancien else 1, chemin, identifiant)
+    _publier(jeu)
+
+    duree = time.perf_counter() - debut
+    if ancien is not None:
+        logger.info("Rechargement v%d en %.2fs : %d lignes (%+d), %d clients (%+d)",
+                    jeu.version, duree, len(df), len(df) - len(ancien.df),
+                    df['code client'].nunique(),
+                    df['code client'].nunique() - ancien.df['code client'].nunique())
+    else:
+        logger.info("Chargement v%d en %.2fs : %d lignes", jeu.version, duree, len(df))
+    return jeu
+
+
+def _signature(source):
+    # Change dès qu'un extrait est modifié, ajouté ou supprimé
+    signature = []
+    for chemin in fichiers_sources(source):
+        try:
+            stat = os.stat(chemin)
+        except OSError:
+            continue
+        signature.append((chemin, stat.st_mtime_ns, stat.st_size))
+    return tuple(signature) or None
+
+
+def surveiller_fichier(chemin, action, intervalle=30):
+    # Thread de fond : appelle action() quand le fichier (ou l'un des fichiers
+    # d'un motif ou d'un répertoire) change, hors du chemin des requêtes.
+    def boucle():
+        vu = _signature(chemin)
+        while True:
+            time.sleep(intervalle)
+            signature = _signature(chemin)
+            if signature is None or signature == vu:
+                continue
+            try:
+                action()
+                vu = signature
+            except Exception:
+                logger.exception("Rechargement après modification de %s impossible", chemin)
+
+    thread = threading.Thread(target=boucle, name='surveillance-donnees', daemon=True)
+    thread.start()
+    return thread
+
+
+def _secondes_avant_minuit():
+    maintenant = pd.Timestamp.now()
+    return (maintenant.normalize() + pd.Timedelta(days=1) - maintenant).total_seconds()
+
+
+def planifier_precalculs():
+    # Les fenêtres du jour sont recalculées à chaque (re)chargement et juste
+    # après minuit par un thread de fond : le premier utilisateur de la journée
+    # trouve les résultats prêts.
+    abonner(lambda jeu: jeu.precalculs())
+
+    def boucle():
+        while True:
+            time.sleep(_secondes_avant_minuit() + 1)
+            jeu = _courant
+            if jeu is None:
+                continue
+            try:
+                jeu.precalculs()
+            except Exception:
+                logger.exception("Précalcul des indicateurs du jour impossible")
+
+    if _courant is not None:
+        _courant.precalculs()
+    thread = threading.Thread(target=boucle, name='precalculs-jour', daemon=True)
+    thread.start()
+    return thread
+
+
+def surveiller(chemin=SOURCE, intervalle=30):
+    # Recharge le Jeu quand le fichier source change (ou, en mode partagé,
+    # quand le maître a publié une nouvelle version). Les callbacks continuent
+    # de servir l'ancien Jeu jusqu'au remplacement.
+    fichier = partage.pointeur(PARTAGE) if PARTAGE else chemin
+    return surveiller_fichier(fichier, lambda: recharger(chemin), intervalle)
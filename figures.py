@@ -0,0 +1,32 @@
+import pandas as pd
+
+# Les graphiques reçoivent des agrégats (une ligne par catégorie) plutôt que
+# les lignes du portefeuille : le JSON envoyé au navigateur grandit avec le
+# nombre de catégories, pas avec le nombre de garanties.
+TOP_CLIENTS = 20
+AUTRES = 'Autres'
+
+
+def repartition(serie, nom_valeur='nb'):
+    # Nombre de lignes par valeur (valeurs manquantes exclues, comme px.pie)
+    comptes = serie.value_counts(sort=False)
+    comptes = comptes[comptes > 0]
+    return comptes.rename(nom_valeur).rename_axis(serie.name).reset_index()
+
+
+def top_n(agregat, colonne, valeur, n, autres=AUTRES):
+    # Les n catégories les plus fortes, le reste cumulé dans une barre "Autres"
+    agregat = agregat.sort_values(valeur, ascending=False, kind='stable')
+    if len(agregat) <= n:
+        return agregat.reset_index(drop=True)
+    reste = pd.DataFrame({colonne: [autres], valeur: [agregat[valeur].iloc[n:].sum()]})
+    tete = agregat.iloc[:n][[colonne, valeur]].astype({colonne: str})
+    return pd.concat([tete, reste], ignore_index=True)
+
+
+def par_client(dff, n=TOP_CLIENTS):
+    # Nombre et montant par client, plafonnés au top n + "Autres"
+    agregat = dff.groupby('nom client', observed=True).agg(
+        nb=('nom client', 'size'), montant=('montant de la garantie', 'sum')).reset_index()
+    return (top_n(agregat[['nom client', 'nb']], 'nom client', 'nb', n),
+            top_n(agregat[['nom client', 'montant']], 'nom client', 'montant', n))
@@ -0,0 +1,26 @@
+# Lancement : gunicorn -c gunicorn.conf.py app:server
+#
+# Le processus maître charge l'extrait une seule fois et publie ses colonnes
+# dans des fichiers mappés en mémoire ; chaque worker les mappe en lecture
+# seule (donnees.PARTAGE), le cache de pages est donc partagé entre workers.
+import os
+
+os.environ.setdefault('DELEGATION_PARTAGE', 'data/.partage')
+
+workers = int(os.environ.get('WEB_CONCURRENCY', 4))
+threads = 4
+
+
+def on_starting(server):
+    import donnees
+    import partage
+
+    racine = os.environ['DELEGATION_PARTAGE']
+
+    def publier():
+        partage.publier(donnees.charger_donnees(donnees.SOURCE), racine)
+
+    publier()
+    # Nouvel extrait : le maître publie une nouvelle version, les workers
+    # basculent dessus en surveillant le fichier COURANT.
+    donnees.surveiller_fichier(donnees.SOURCE, publier)
@@ -0,0 +1,54 @@
+import numpy as np
+
+from partitions import decouper
+
+# Valeur entière des dates manquantes : plus ancienne que toute date réelle,
+# elle ne l'emporte jamais dans la dernière mise en place d'un client qui a
+# au moins une date
+_JAMAIS = np.iinfo('int64').min
+
+
+class IndexClients:
+    # Index par code client au format CSR : les lignes triées par client
+    # (ordre) et, pour chaque client, le début de sa tranche (debuts). Les
+    # lignes d'un client se lisent sans parcourir le portefeuille, et les
+    # agrégats par client (dernière mise en place) sont calculés une fois par
+    # chargement.
+    def __init__(self, df):
+        self.codes, self.valeurs, self.ordre, self.debuts = decouper(df['code client'])
+
+        mises_en_place = df['date de mise en place'].to_numpy(dtype='datetime64[ns]').view('int64').copy()
+        mises_en_place[df['date de mise en place'].isna().to_numpy()] = _JAMAIS
+        self.mises_en_place = mises_en_place
+        # Chaque client a au moins une ligne : aucune tranche vide pour reduceat
+        if len(self.valeurs):
+            self.derniere_mise_en_place = np.maximum.reduceat(mises_en_place[self.ordre], self.debuts[:-1])
+        else:
+            self.derniere_mise_en_place = np.empty(0, dtype='int64')
+
+    @property
+    def nb_clients(self):
+        return len(self.valeurs)
+
+    def lignes(self, code):
+        # Positions des lignes du client code (dans l'ordre des lignes)
+        i = self.valeurs.get_indexer([code])[0]
+        if i < 0:
+            return np.empty(0, dtype=self.ordre.dtype)
+        return self.ordre[self.debuts[i]:self.debuts[i + 1]]
+
+    def renouvelees(self, lignes):
+        # Pour chaque ligne, le client a-t-il une garantie mise en place après
+        # celle-ci ? Coût proportionnel au nombre de lignes interrogées. Une
+        # ligne sans date de mise en place n'est jamais renouvelée (comme une
+        # comparaison avec NaT) : _JAMAIS ne vaut que pour le maximum.
+        mises_en_place = self.mises_en_place[lignes]
+        codes = self.codes[lignes]
+        connus = (codes >= 0) & (mises_en_place != _JAMAIS)
+        resultat = np.zeros(len(lignes), dtype=bool)
+        resultat[connus] = self.derniere_mise_en_place[codes[connus]] > mises_en_place[connus]
+        return resultat
+
+    def nb_clients_distincts(self, lignes):
+        codes = self.codes[lignes]
+        return len(np.unique(codes[codes >= 0]))
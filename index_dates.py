@@ -0,0 +1,48 @@
+import numpy as np
+import pandas as pd
+
+# Colonnes interrogées par fenêtre glissante (échéances, renouvellements,
+# réévaluations, engagements échus)
+COLONNES_FENETRES = ['date d echeance', 'date de mise en place', 'date de derniere reevaluation',
+                     'date de maturite de l engagement']
+
+
+def _instant(valeur):
+    return pd.Timestamp(valeur).as_unit('ns').value
+
+
+class IndexDate:
+    # Dates triées (entiers int64 en nanosecondes, NaT exclus) et numéros de
+    # ligne correspondants : une fenêtre [debut, fin] se résout par deux
+    # recherches dichotomiques, en O(log n + k).
+    # On garde la résolution à la nanoseconde plutôt qu'au jour : une date
+    # avec heure se compare aux bornes (minuit, voir precalcul) exactement
+    # comme en pandas.
+    def __init__(self, serie):
+        dates = serie.to_numpy(dtype='datetime64[ns]')
+        valides = ~np.isnat(dates)
+        lignes = np.flatnonzero(valides)
+        valeurs = dates[valides].view('int64')
+        ordre = np.argsort(valeurs, kind='stable')
+        self.valeurs = valeurs[ordre]
+        self.lignes = lignes[ordre]
+
+    def _bornes(self, debut, fin):
+        bas = 0 if debut is None else np.searchsorted(self.valeurs, _instant(debut), side='left')
+        haut = len(self.valeurs) if fin is None else np.searchsorted(self.valeurs, _instant(fin), side='right')
+        return bas, haut
+
+    def fenetre(self, debut=None, fin=None, masque=None):
+        # Positions (dans l'ordre des lignes) des dates comprises entre debut et
+        # fin inclus, restreintes au masque de filtres s'il y en a un
+        bas, haut = self._bornes(debut, fin)
+        lignes = np.sort(self.lignes[bas:haut])
+        if masque is None:
+            return lignes
+        return lignes[masque[lignes]]
+
+    def compter(self, debut=None, fin=None, masque=None):
+        bas, haut = self._bornes(debut, fin)
+        if masque is None:
+            return int(haut - bas)
+        return int(masque[self.lignes[bas:haut]].sum())
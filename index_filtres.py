@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+
+
+def _bitmaps(serie):
+    # Un masque booléen par valeur distincte (les valeurs manquantes n'en ont pas,
+    # comme avec isin)
+    codes, valeurs = pd.factorize(serie)
+    return {valeur: codes == i for i, valeur in enumerate(valeurs.tolist())}
+
+
+class IndexFiltres:
+    # Construit une fois par chargement : les filtres type / assureur / année
+    # deviennent des OU puis des ET de masques précalculés.
+    def __init__(self, df):
+        self.taille = len(df)
+        self.nature = _bitmaps(df['libelle nature'])
+        self.garant = _bitmaps(df['nom garant'])
+        self.annee = _bitmaps(df['date de mise en place'].dt.year)
+
+    def _union(self, bitmaps, valeurs):
+        masque = np.zeros(self.taille, dtype=bool)
+        for valeur in valeurs:
+            bitmap = bitmaps.get(valeur)
+            if bitmap is not None:
+                masque |= bitmap
+        return masque
+
+    def masque(self, type_filter=None, assur_filter=None, year_filter=None):
+        # None quand aucun filtre n'est actif : toutes les lignes sont retenues
+        masque = None
+        for bitmaps, valeurs in ((self.nature, type_filter), (self.garant, assur_filter),
+                                 (self.annee, year_filter)):
+            if not valeurs:
+                continue
+            union = self._union(bitmaps, valeurs)
+            masque = union if masque is None else masque & union
+        return masque
+
+
+def selectionner(df, index, type_filter=None, assur_filter=None, year_filter=None):
+    # Sans filtre on rend le DataFrame partagé lui-même : les fonctions de rendu
+    # ne doivent donc jamais le modifier.
+    masque = index.masque(type_filter, assur_filter, year_filter)
+    if masque is None:
+        return df
+    return df[masque]
@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+
+
+class IndexIntervalles:
+    # Périodes de validité [date de mise en place, date d echeance] : débuts
+    # et fins triés avec les montants cumulés dans cet ordre (balayage). Le
+    # nombre et le montant des garanties actives à une date se lisent par deux
+    # recherches dichotomiques, en O(log n), pour n'importe quelle date.
+    def __init__(self, df):
+        debuts = df['date de mise en place'].to_numpy(dtype='datetime64[ns]')
+        fins = df['date d echeance'].to_numpy(dtype='datetime64[ns]')
+        montants = df['montant de la garantie'].to_numpy(dtype='float64', na_value=np.nan)
+        # Les périodes sans début, sans fin ou inversées ne sont jamais actives
+        valides = ~np.isnat(debuts) & ~np.isnat(fins) & (debuts <= fins)
+        self.lignes = np.flatnonzero(valides)
+        self._periodes = (debuts[valides].view('int64'), fins[valides].view('int64'),
+                          np.where(np.isnan(montants[valides]), 0, montants[valides]))
+        self._balayer()
+
+    def _balayer(self):
+        debuts, fins, montants = self._periodes
+        ordre = np.argsort(debuts, kind='stable')
+        self.debuts = debuts[ordre]
+        self.montants_debuts = np.concatenate([[0], np.cumsum(montants[ordre])])
+        ordre = np.argsort(fins, kind='stable')
+        self.fins = fins[ordre]
+        self.montants_fins = np.concatenate([[0], np.cumsum(montants[ordre])])
+
+    def restreindre(self, masque):
+        # Même index limité aux lignes du masque de filtres, en O(k log k)
+        if masque is None:
+            return self
+        garder = masque[self.lignes]
+        index = object.__new__(IndexIntervalles)
+        index.lignes = self.lignes[garder]
+        index._periodes = tuple(valeurs[garder] for valeurs in self._periodes)
+        index._balayer()
+        return index
+
+    def __len__(self):
+        return len(self.debuts)
+
+    def _actives(self, instants):
+        # Commencées au plus tard à l'instant, moins celles déjà terminées
+        commencees = np.searchsorted(self.debuts, instants, side='right')
+        terminees = np.searchsorted(self.fins, instants, side='left')
+        return (commencees - terminees,
+                self.montants_debuts[commencees] - self.montants_fins[terminees])
+
+    def actives(self, jour):
+        # Nombre et montant des garanties actives le jour donné
+        nb, montant = self._actives(np.int64(pd.Timestamp(jour).as_unit('ns').value))
+        return int(nb), float(montant)
+
+    def courbe(self, debut=None, fin=None):
+        # Nombre et montant actifs pour chaque jour de [debut, fin] (par défaut
+        # toute la période couverte)
+        if not len(self):
+            return pd.DataFrame({'date': pd.DatetimeIndex([]), 'nb': [], 'montant': []})
+        debut = pd.Timestamp(self.debuts[0]).normalize() if debut is None else pd.Timestamp(debut)
+        fin = pd.Timestamp(self.fins[-1]).normalize() if fin is None else pd.Timestamp(fin)
+        jours = pd.date_range(debut, fin, freq='D')
+        nb, montant = self._actives(jours.to_numpy(dtype='datetime64[ns]').view('int64'))
+        return pd.DataFrame({'date': jours, 'nb': nb, 'montant': montant})
@@ -0,0 +1,170 @@
+import csv
+import logging
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Lecture en flux des extraits : le classeur est parcouru en lecture seule
+# (openpyxl ne garde pas la feuille en mémoire) ou le CSV par morceaux, chaque
+# bloc est typé puis ajouté au fichier parquet. La mémoire de pointe dépend de
+# TAILLE_BLOC, pas de la taille du fichier.
+TAILLE_BLOC = int(os.environ.get('DELEGATION_TAILLE_BLOC', 50_000))
+FEUILLE = 'Sheet1'
+
+
+def _blocs_excel(chemin, taille_bloc):
+    from openpyxl import load_workbook
+
+    classeur = load_workbook(chemin, read_only=True, data_only=True)
+    try:
+        lignes = classeur[FEUILLE].iter_rows(values_only=True)
+        entetes = [str(c) if c is not None else '' for c in next(lignes, ())]
+        bloc = []
+        for ligne in lignes:
+            # Lignes entièrement vides (fin de feuille mal dimensionnée) ignorées
+            if all(c is None for c in ligne):
+                continue
+            bloc.append(ligne)
+            if len(bloc) == taille_bloc:
+                yield pd.DataFrame(bloc, columns=entetes)
+                bloc = []
+        if bloc:
+            yield pd.DataFrame(bloc, columns=entetes)
+    finally:
+        classeur.close()
+
+
+def _separateur(chemin):
+    with open(chemin, newline='', encoding='utf-8-sig') as f:
+        entete = f.readline()
+    try:
+        return csv.Sniffer().sniff(entete, delimiters=',;\t').delimiter
+    except csv.Error:
+        return ','
+
+
+def _blocs_csv(chemin, taille_bloc):
+    # Tout en texte : le typage est fait bloc par bloc, comme pour l'Excel
+    yield from pd.read_csv(chemin, sep=_separateur(chemin), dtype=str, chunksize=taille_bloc,
+                           encoding='utf-8-sig', keep_default_na=False, na_values=[''])
+
+
+def lire_blocs(chemin, taille_bloc=TAILLE_BLOC):
+    # Blocs bruts de taille_bloc lignes, colonnes telles que dans le fichier
+    if os.path.splitext(chemin)[1].lower() == '.csv':
+        return _blocs_csv(chemin, taille_bloc)
+    return _blocs_excel(chemin, taille_bloc)
+
+
+def _schema(bloc):
+    # Schéma figé sur le premier bloc : texte, date, entier ou flottant. Les
+    # colonnes sont nullables : un bloc suivant peut contenir des cellules vides.
+    # Les colonnes texte de schema.SCHEMA arrivent ici déjà en chaînes (typer) :
+    # un premier bloc aux codes tout numériques ne fige pas un type entier.
+    import pyarrow as pa
+
+    champs = []
+    for col in bloc.columns:
+        dtype = bloc[col].dtype
+        if pd.api.types.is_datetime64_dtype(dtype):
+            champs.append(pa.field(col, pa.timestamp('ns')))
+        elif pd.api.types.is_integer_dtype(dtype):
+            champs.append(pa.field(col, pa.int64()))
+        elif pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype):
+            champs.append(pa.field(col, pa.float64()))
+        else:
+            champs.append(pa.field(col, pa.string()))
+    return pa.schema(champs)
+
+
+def _conformer(bloc, schema, premiere_ligne):
+    # Bloc -> table au schéma du premier bloc. Une valeur que le type figé ne
+    # peut pas représenter (texte dans une colonne numérique, décimale dans
+    # une colonne entière) lève une erreur au lieu de devenir manquante.
+    import pyarrow as pa
+
+    for champ in schema:
+        serie = bloc[champ.name]
+        if champ.type == pa.string():
+            bloc[champ.name] = serie.where(serie.isna(), serie.astype(str))
+            continue
+        if champ.type == pa.timestamp('ns'):
+            converti = pd.to_datetime(serie, errors='coerce')
+            perdues = serie.notna() & converti.isna()
+        else:
+            converti = pd.to_numeric(serie, errors='coerce').astype('float64')
+            perdues = serie.notna() & converti.isna()
+            if champ.type == pa.int64():
+                perdues |= converti.notna() & (converti % 1 != 0)
+                converti = converti.astype('Int64') if not perdues.any() else converti
+        if perdues.any():
+            position = int(np.flatnonzero(perdues.to_numpy())[0])
+            raise ValueError(f"Colonne {champ.name!r}, ligne {premiere_ligne + position} : valeur "
+                             f"'{serie.iloc[position]}' incompatible avec le type {champ.type} "
+                             f"fixé par le premier bloc")
+        bloc[champ.name] = converti
+    return pa.Table.from_pandas(bloc, schema=schema, preserve_index=False)
+
+
+def ingerer(chemin, destination, typer, taille_bloc=TAILLE_BLOC):
+    # Source -> parquet, un groupe de lignes par bloc. typer(bloc) convertit un
+    # bloc brut (dates, durée...). Écrit dans destination + '.tmp' puis renomme.
+    import pyarrow.parquet as pq
+
+    debut = time.perf_counter()
+    tmp = destination + '.tmp'
+    ecrivain = None
+    lignes = 0
+    try:
+        for bloc in lire_blocs(chemin, taille_bloc):
+            bloc = typer(bloc)
+            if ecrivain is None:
+                schema = _schema(bloc)
+                ecrivain = pq.ParquetWriter(tmp, schema)
+            ecrivain.write_table(_conformer(bloc, schema, lignes + 2))
+            lignes += len(bloc)
+            duree = time.perf_counter() - debut
+            logger.info("Ingestion %s : %d lignes (%.0f lignes/s)",
+                        os.path.basename(chemin), lignes, lignes / duree if duree else 0)
+    finally:
+        if ecrivain is not None:
+            ecrivain.close()
+    if ecrivain is None:
+        raise ValueError(f"{chemin} : aucune ligne à ingérer")
+    os.replace(tmp, destination)
+    logger.info("Ingestion %s terminée : %d lignes en %.1fs", chemin, lignes, time.perf_counter() - debut)
+    return lignes
+
+
+def lire_parquet(chemins, categories=(), etiquette=None):
+    # Un ou plusieurs fichiers parquet concaténés dans l'ordre. Les colonnes de
+    # categories sont lues directement en dictionnaire (pas de passage par des
+    # objets Python), catégories triées comme astype('category'). Avec
+    # etiquette, une colonne de ce nom indique le fichier d'origine de chaque
+    # ligne (nom du parquet sans extension).
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    if isinstance(chemins, str):
+        chemins = [chemins]
+    tables = []
+    for chemin in chemins:
+        colonnes = pq.read_schema(chemin).names
+        table = pq.read_table(chemin, read_dictionary=[c for c in categories if c in colonnes])
+        if etiquette:
+            nom = os.path.splitext(os.path.basename(chemin))[0]
+            table = table.append_column(etiquette, pa.DictionaryArray.from_arrays(
+                pa.array(np.zeros(len(table), dtype='int32')), pa.array([nom])))
+        tables.append(table)
+    table = pa.concat_tables(tables, promote_options='permissive')
+    del tables
+    df = table.to_pandas(self_destruct=True, split_blocks=True)
+    del table
+    for col in list(categories) + ([etiquette] if etiquette else []):
+        if col in df.columns and isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].cat.reorder_categories(sorted(df[col].cat.categories))
+    return df
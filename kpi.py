@@ -0,0 +1,117 @@
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+import precalcul
+
+SITUATIONS = {'actives': 'Active', 'expirees': 'Expirée', 'resiliees': 'Résiliée'}
+NS_PAR_JOUR = 86_400 * 10 ** 9
+
+
+@dataclass(frozen=True)
+class Indicateurs:
+    # Jeu complet d'indicateurs d'une sélection, valeurs brutes (non formatées)
+    clients: int
+    total: int
+    actives: int
+    expirees: int
+    resiliees: int
+    mt_total: float
+    mt_moyen: float
+    eng_total: float
+    echeances_3mois: int
+    renouvellements_30j: int
+    duree_moyenne: float
+    delai_moyen: float
+
+    @property
+    def ratio(self):
+        # Garantie / engagement, 0 sans engagement
+        return self.mt_total / self.eng_total if self.eng_total > 0 else 0
+
+
+def _moyenne(somme, nb):
+    return somme / nb if nb else float('nan')
+
+
+def _dates(dff, colonne):
+    return dff[colonne].to_numpy(dtype='datetime64[ns]')
+
+
+def _dans(dates, nom, jour):
+    # Nombre de dates dans la fenêtre nom (NaT exclus : toute comparaison
+    # avec NaT est fausse)
+    _, debut, fin = precalcul.bornes(nom, jour)
+    masque = np.ones(len(dates), dtype=bool)
+    if debut is not None:
+        masque &= dates >= debut.to_datetime64()
+    if fin is not None:
+        masque &= dates <= fin.to_datetime64()
+    return int(np.count_nonzero(masque))
+
+
+def _nb_distincts(serie):
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        codes = serie.cat.codes.to_numpy()
+        return int(np.count_nonzero(np.bincount(codes[codes >= 0], minlength=1)))
+    return int(serie.nunique())
+
+
+def calculer(dff, jour=None):
+    # Tous les indicateurs en une passe : un value_counts pour les situations,
+    # une seule somme sur une matrice (montants, durées), des comptages de
+    # masques pour les fenêtres, au lieu d'un filtre et d'une copie par
+    # indicateur.
+    jour = precalcul.aujourd_hui() if jour is None else jour
+    situations = dff['situationde la garantie'].value_counts()
+
+    mise_en_place = _dates(dff, 'date de mise en place')
+    saisie = _dates(dff, 'date de saisie')
+    # Jours entiers arrondis vers le bas, comme .dt.days
+    delai = ((mise_en_place - saisie).view('int64') // NS_PAR_JOUR).astype('float64')
+    delai[np.isnat(mise_en_place) | np.isnat(saisie)] = np.nan
+
+    valeurs = np.vstack([
+        dff['montant de la garantie'].to_numpy(dtype='float64', na_value=np.nan),
+        dff['montant engagement couvert actualisé'].to_numpy(dtype='float64', na_value=np.nan),
+        dff['duree_garantie'].to_numpy(dtype='float64', na_value=np.nan),
+        delai,
+    ])
+    presents = ~np.isnan(valeurs)
+    sommes = np.where(presents, valeurs, 0).sum(axis=1)
+    nombres = presents.sum(axis=1)
+    mt, eng, duree, delai = sommes
+
+    return Indicateurs(
+        clients=_nb_distincts(dff['code client']),
+        total=len(dff),
+        **{champ: int(situations.get(valeur, 0)) for champ, valeur in SITUATIONS.items()},
+        mt_total=float(mt),
+        mt_moyen=_moyenne(mt, nombres[0]),
+        eng_total=float(eng),
+        echeances_3mois=_dans(_dates(dff, 'date d echeance'), 'echeances_3mois', jour),
+        renouvellements_30j=_dans(mise_en_place, 'renouvellements_30j', jour),
+        duree_moyenne=_moyenne(duree, nombres[2]),
+        delai_moyen=_moyenne(delai, nombres[3]),
+    )
+
+
+def depuis_selection(sel):
+    # Même résultat à partir des agrégats d'un Jeu (cube, fenêtres précalculées)
+    # sans repasser sur les lignes
+    vue = sel.vue
+    totaux = vue.totaux()
+    situations = vue.par('situationde la garantie').set_index('situationde la garantie')['nb']
+    return Indicateurs(
+        clients=int(vue.nb_clients()),
+        total=int(totaux['nb']),
+        **{champ: int(situations.get(valeur, 0)) for champ, valeur in SITUATIONS.items()},
+        mt_total=float(totaux['mt_somme']),
+        mt_moyen=_moyenne(totaux['mt_somme'], totaux['mt_nb']),
+        eng_total=float(totaux['eng_somme']),
+        echeances_3mois=sel.compter_fenetre('echeances_3mois'),
+        renouvellements_30j=sel.compter_fenetre('renouvellements_30j'),
+        duree_moyenne=_moyenne(totaux['duree_somme'], totaux['duree_nb']),
+        delai_moyen=_moyenne(totaux['delai_somme'], totaux['delai_nb']),
+    )
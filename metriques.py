@@ -0,0 +1,237 @@
+import cProfile
+import functools
+import importlib
+import itertools
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import Response, g, request
+
+from cache_rendu import taille_rendu, taille_servie
+
+logger = logging.getLogger(__name__)
+
+BORNES_SECONDES = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10]
+BORNES_LIGNES = [10, 100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000]
+BORNES_OCTETS = [1_000, 10_000, 100_000, 1_000_000, 10_000_000, 100_000_000]
+
+HISTOGRAMMES = {
+    'dash_callback_secondes': ("Durée des callbacks Dash", BORNES_SECONDES),
+    'dash_section_secondes': ("Durée de calcul des sections et onglets", BORNES_SECONDES),
+    'dash_figure_secondes': ("Durée de construction des figures Plotly", BORNES_SECONDES),
+    'dash_lignes_filtrees': ("Lignes retenues par les filtres", BORNES_LIGNES),
+    'dash_payload_octets': ("Taille JSON des réponses de callback", BORNES_OCTETS),
+}
+
+# Profilage à la demande : une requête portant l'en-tête X-Profilage
+# (cprofile ou pyinstrument) est profilée et le rapport écrit dans
+# REPERTOIRE_PROFILS. Désactivé tant que DASH_PROFILAGE n'est pas défini.
+PROFILAGE_ACTIF = bool(os.environ.get('DASH_PROFILAGE'))
+
+# Réponses de callback qui ne passent pas par un CacheRendu : taille mesurée
+# sur une réponse sur ECHANTILLON_TAILLE (une sérialisation complète de plus)
+ECHANTILLON_TAILLE = int(os.environ.get('DASH_ECHANTILLON_TAILLE', 10))
+REPERTOIRE_PROFILS = os.environ.get('DASH_PROFILS', 'profils')
+
+_verrou = threading.Lock()
+_series = {}
+_collecteurs = []
+_demarrage = {}
+# Numéro des profils écrits par ce processus : avec le pid, deux requêtes
+# profilées dans la même seconde (threads ou workers) n'écrivent jamais dans
+# le même fichier
+_numeros_profil = itertools.count(1)
+
+
+def _apres_fork():
+    # Processus fils des callbacks d'arrière-plan : verrou neuf (un thread du
+    # parent pouvait le tenir au moment du fork). Les observations faites
+    # dans le fils ne remontent pas au /metrics du parent.
+    global _verrou
+    _verrou = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_apres_fork)
+
+
+def observer(nom, valeur, **etiquettes):
+    cle = (nom, tuple(sorted(etiquettes.items())))
+    bornes = HISTOGRAMMES[nom][1]
+    with _verrou:
+        serie = _series.get(cle)
+        if serie is None:
+            serie = _series[cle] = {'compteurs': [0] * len(bornes), 'somme': 0.0, 'nombre': 0}
+        for i, borne in enumerate(bornes):
+            if valeur <= borne:
+                serie['compteurs'][i] += 1
+        serie['somme'] += valeur
+        serie['nombre'] += 1
+
+
+@contextmanager
+def chronometre(nom, **etiquettes):
+    debut = time.perf_counter()
+    try:
+        yield
+    finally:
+        observer(nom, time.perf_counter() - debut, **etiquettes)
+
+
+@contextmanager
+def phase(nom):
+    # Phase du démarrage (import, chargement, layout), voir rapport_demarrage
+    debut = time.perf_counter()
+    try:
+        yield
+    finally:
+        enregistrer_phase(nom, time.perf_counter() - debut)
+
+
+def enregistrer_phase(nom, secondes):
+    with _verrou:
+        _demarrage[nom] = secondes
+
+
+def rapport_demarrage():
+    # Durée de chaque phase du démarrage, journalisée et exposée dans /metrics
+    with _verrou:
+        phases = dict(_demarrage)
+    logger.info("Démarrage en %.2fs (%s)", sum(phases.values()),
+                ', '.join(f"{nom} {secondes:.2f}s" for nom, secondes in phases.items()))
+    return phases
+
+
+def ajouter_collecteur(fonction):
+    # fonction() -> liste de (nom, type prometheus, valeur) ajoutée à /metrics
+    _collecteurs.append(fonction)
+
+
+def instrumenter_callback(nom):
+    # Latence et taille de la réponse sérialisée d'un callback Dash. La
+    # taille est celle que le cache de rendus a déjà calculée ; à défaut elle
+    # est mesurée par échantillonnage.
+    def decorateur(fonction):
+        appels = itertools.count()
+
+        @functools.wraps(fonction)
+        def appel(*args, **kwargs):
+            taille_servie()
+            with chronometre('dash_callback_secondes', callback=nom):
+                resultat = fonction(*args, **kwargs)
+            taille = taille_servie()
+            if taille is None and next(appels) % ECHANTILLON_TAILLE == 0:
+                taille = taille_rendu(resultat)
+            if taille is not None:
+                observer('dash_payload_octets', taille, callback=nom)
+            return resultat
+        return appel
+    return decorateur
+
+
+class _PlotlyChronometre:
+    # Enveloppe plotly.express : chaque figure construite est chronométrée,
+    # étiquetée par son titre. Donné par son nom, le module n'est importé qu'à
+    # la première figure (plotly.express est long à importer).
+    def __init__(self, module):
+        self._module = module
+
+    def __getattr__(self, nom):
+        if isinstance(self._module, str):
+            self._module = importlib.import_module(self._module)
+        fonction = getattr(self._module, nom)
+        if not callable(fonction):
+            return fonction
+
+        @functools.wraps(fonction)
+        def appel(*args, **kwargs):
+            with chronometre('dash_figure_secondes', figure=kwargs.get('title') or nom):
+                return fonction(*args, **kwargs)
+        return appel
+
+
+def chronometrer_figures(module):
+    return _PlotlyChronometre(module)
+
+
+def _format_etiquettes(etiquettes, **extra):
+    paires = list(etiquettes) + list(extra.items())
+    if not paires:
+        return ''
+    return '{' + ','.join(f'{k}="{str(v).replace(chr(34), chr(39))}"' for k, v in paires) + '}'
+
+
+def exposer():
+    lignes = []
+    with _verrou:
+        series = {cle: dict(v, compteurs=list(v['compteurs'])) for cle, v in _series.items()}
+    for nom, (aide, bornes) in HISTOGRAMMES.items():
+        lignes += [f"# HELP {nom} {aide}", f"# TYPE {nom} histogram"]
+        for (nom_serie, etiquettes), serie in sorted(series.items()):
+            if nom_serie != nom:
+                continue
+            for borne, compteur in zip(bornes, serie['compteurs']):
+                lignes.append(f"{nom}_bucket{_format_etiquettes(etiquettes, le=borne)} {compteur}")
+            lignes.append(f"{nom}_bucket{_format_etiquettes(etiquettes, le='+Inf')} {serie['nombre']}")
+            lignes.append(f"{nom}_sum{_format_etiquettes(etiquettes)} {serie['somme']}")
+            lignes.append(f"{nom}_count{_format_etiquettes(etiquettes)} {serie['nombre']}")
+    with _verrou:
+        phases = dict(_demarrage)
+    if phases:
+        lignes += ["# HELP dash_demarrage_secondes Durée des phases du démarrage",
+                   "# TYPE dash_demarrage_secondes gauge"]
+        lignes += [f"dash_demarrage_secondes{_format_etiquettes((), phase=nom)} {secondes}"
+                   for nom, secondes in phases.items()]
+    for collecteur in _collecteurs:
+        for nom, type_metrique, valeur in collecteur():
+            lignes += [f"# TYPE {nom} {type_metrique}", f"{nom} {valeur}"]
+    return '\n'.join(lignes) + '\n'
+
+
+def _debut_profilage():
+    mode = request.headers.get('X-Profilage')
+    if not PROFILAGE_ACTIF or not mode:
+        return
+    if mode == 'pyinstrument':
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            logger.warning("pyinstrument absent, profilage cProfile à la place")
+        else:
+            g.profilage = ('pyinstrument', Profiler())
+            g.profilage[1].start()
+            return
+    g.profilage = ('cprofile', cProfile.Profile())
+    g.profilage[1].enable()
+
+
+def _fin_profilage(reponse):
+    profilage = g.pop('profilage', None)
+    if profilage is None:
+        return reponse
+    mode, profiler = profilage
+    os.makedirs(REPERTOIRE_PROFILS, exist_ok=True)
+    nom = f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{next(_numeros_profil)}"
+    base = os.path.join(REPERTOIRE_PROFILS, f"{nom}-{request.path.strip('/').replace('/', '_')}")
+    if mode == 'pyinstrument':
+        profiler.stop()
+        chemin = base + '.html'
+        with open(chemin, 'w', encoding='utf-8') as f:
+            f.write(profiler.output_html())
+    else:
+        profiler.disable()
+        chemin = base + '.prof'
+        profiler.dump_stats(chemin)
+    reponse.headers['X-Profil'] = chemin
+    logger.info("Profil %s écrit dans %s", mode, chemin)
+    return reponse
+
+
+def installer(server):
+    # Route /metrics au format texte Prometheus et profilage par en-tête
+    server.add_url_rule('/metrics', 'metrics',
+                        lambda: Response(exposer(), mimetype='text/plain; version=0.0.4'))
+    server.before_request(_debut_profilage)
+    server.after_request(_fin_profilage)
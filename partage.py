@@ -0,0 +1,92 @@
+import json
+import logging
+import os
+import shutil
+import time
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Un répertoire par version, plus un fichier COURANT qui désigne la version à
+# mapper. Le processus chargeur écrit une nouvelle version puis bascule
+# COURANT par renommage atomique ; chaque worker mappe les colonnes en lecture
+# seule et le cache de pages du noyau est partagé entre tous.
+POINTEUR = 'COURANT'
+VERSIONS_CONSERVEES = 2
+
+
+def pointeur(racine):
+    return os.path.join(racine, POINTEUR)
+
+
+def _ecrire_colonne(rep, i, serie):
+    base = os.path.join(rep, str(i))
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        np.save(base + '.npy', serie.cat.codes.to_numpy())
+        return {'type': 'categorie', 'categories': serie.cat.categories.tolist()}
+    if pd.api.types.is_datetime64_dtype(serie.dtype):
+        np.save(base + '.npy', serie.to_numpy(dtype='datetime64[ns]').view('int64'))
+        return {'type': 'date'}
+    if isinstance(serie.dtype, pd.api.extensions.ExtensionDtype) and hasattr(serie.array, '_mask'):
+        np.save(base + '.npy', serie.array._data)
+        np.save(base + '.masque.npy', serie.array._mask)
+        return {'type': 'nullable', 'dtype': str(serie.dtype)}
+    if serie.dtype == object:
+        # Texte très varié : stocké comme catégorie pour rester mappable
+        return _ecrire_colonne(rep, i, serie.astype('category'))
+    np.save(base + '.npy', serie.to_numpy())
+    return {'type': 'numpy'}
+
+
+def publier(df, racine):
+    os.makedirs(racine, exist_ok=True)
+    version = str(int(time.time() * 1000))
+    rep = os.path.join(racine, version)
+    tmp = rep + '.tmp'
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+
+    colonnes = []
+    for i, col in enumerate(df.columns):
+        colonnes.append(dict(_ecrire_colonne(tmp, i, df[col]), nom=col))
+    with open(os.path.join(tmp, 'manifeste.json'), 'w', encoding='utf-8') as f:
+        json.dump({'version': version, 'lignes': len(df), 'colonnes': colonnes}, f, ensure_ascii=False)
+    os.replace(tmp, rep)
+
+    with open(pointeur(racine) + '.tmp', 'w', encoding='utf-8') as f:
+        f.write(version)
+    os.replace(pointeur(racine) + '.tmp', pointeur(racine))
+    logger.info("Version partagée %s publiée (%d lignes)", version, len(df))
+
+    # Les anciennes versions peuvent être supprimées même si un worker les
+    # mappe encore : le noyau garde les fichiers tant qu'ils sont ouverts.
+    anciennes = sorted(v for v in os.listdir(racine) if v.isdigit())[:-VERSIONS_CONSERVEES]
+    for v in anciennes:
+        shutil.rmtree(os.path.join(racine, v), ignore_errors=True)
+    return version
+
+
+def ouvrir(racine):
+    with open(pointeur(racine), encoding='utf-8') as f:
+        version = f.read().strip()
+    rep = os.path.join(racine, version)
+    with open(os.path.join(rep, 'manifeste.json'), encoding='utf-8') as f:
+        manifeste = json.load(f)
+
+    colonnes = {}
+    for i, info in enumerate(manifeste['colonnes']):
+        valeurs = np.load(os.path.join(rep, f"{i}.npy"), mmap_mode='r')
+        if info['type'] == 'categorie':
+            colonnes[info['nom']] = pd.Categorical.from_codes(valeurs, info['categories'])
+        elif info['type'] == 'date':
+            colonnes[info['nom']] = valeurs.view('datetime64[ns]')
+        elif info['type'] == 'nullable':
+            masque = np.load(os.path.join(rep, f"{i}.masque.npy"), mmap_mode='r')
+            classe = pd.api.types.pandas_dtype(info['dtype']).construct_array_type()
+            colonnes[info['nom']] = classe(valeurs, masque)
+        else:
+            colonnes[info['nom']] = valeurs
+    logger.info("Version partagée %s mappée (%d lignes)", version, manifeste['lignes'])
+    return pd.DataFrame(colonnes, copy=False)
@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+
+from kpi import SITUATIONS
+
+
+def decouper(serie, trier=False):
+    # Partitionnement d'une colonne au format CSR : codes par ligne, valeurs
+    # distinctes, lignes regroupées par valeur (ordre des lignes conservé dans
+    # chaque groupe) et début de chaque groupe. Les valeurs manquantes ne sont
+    # dans aucun groupe.
+    codes, valeurs = pd.factorize(serie, sort=trier)
+    connus = np.flatnonzero(codes >= 0)
+    ordre = connus[np.argsort(codes[connus], kind='stable')]
+    debuts = np.searchsorted(codes[ordre], np.arange(len(valeurs) + 1))
+    return codes, valeurs, ordre, debuts
+
+
+class PartitionsGarant:
+    # Portefeuille partitionné par assureur au chargement : les lignes de
+    # chaque assureur et un résumé par partition (nombre, montants, situations,
+    # clients). L'onglet assurance lit les résumés, le détail d'un assureur ne
+    # lit que sa partition.
+    def __init__(self, df):
+        self.codes, self.garants, self.ordre, self.debuts = decouper(df['nom garant'], trier=True)
+        self.garants = pd.Index(self.garants.astype(str), name='nom garant')
+
+        connus = self.codes >= 0
+        clients = pd.DataFrame({'garant': self.codes[connus],
+                                'client': pd.factorize(df['code client'])[0][connus]})
+        clients = clients[clients['client'] >= 0].drop_duplicates().groupby('garant').size()
+        resume = pd.DataFrame({
+            'nb': np.diff(self.debuts),
+            'montant': self._sommes(df['montant de la garantie']),
+            'engagement': self._sommes(df['montant engagement couvert actualisé']),
+            'clients': clients.reindex(range(len(self.garants)), fill_value=0).to_numpy(),
+        }, index=self.garants)
+        situation = df['situationde la garantie'].to_numpy()[self.ordre]
+        for champ, valeur in SITUATIONS.items():
+            resume[champ] = self._reduire((situation == valeur).astype('int64'))
+        self.resume = resume
+
+    def _reduire(self, valeurs):
+        # Somme par partition de valeurs rangées dans l'ordre des partitions ;
+        # chaque assureur a au moins une ligne, aucune tranche n'est vide
+        if not len(self.garants):
+            return np.empty(0, dtype=valeurs.dtype)
+        return np.add.reduceat(valeurs, self.debuts[:-1])
+
+    def _sommes(self, serie):
+        # Valeurs manquantes ignorées
+        valeurs = serie.to_numpy(dtype='float64', na_value=np.nan)[self.ordre]
+        return self._reduire(np.where(np.isnan(valeurs), 0, valeurs))
+
+    def code(self, garant):
+        return self.garants.get_indexer([garant])[0]
+
+    def lignes(self, garant):
+        # Positions des lignes de l'assureur (dans l'ordre des lignes)
+        i = self.code(garant)
+        if i < 0:
+            return np.empty(0, dtype=self.ordre.dtype)
+        return self.ordre[self.debuts[i]:self.debuts[i + 1]]
+
+    def restreindre(self, lignes, garant):
+        # Parmi des positions quelconques, celles de l'assureur
+        i = self.code(garant)
+        if i < 0:
+            return lignes[:0]
+        return lignes[self.codes[lignes] == i]
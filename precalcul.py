@@ -0,0 +1,66 @@
+import logging
+import time
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Fenêtres glissantes relatives au jour : (colonne de date, début, fin) en
+# jours par rapport à aujourd'hui, None pour une borne ouverte. Le jour de
+# référence est minuit : les résultats ne changent qu'au changement de date ou
+# au rechargement des données.
+FENETRES = {
+    'echeances_3mois': ('date d echeance', 0, 90),
+    'renouvellements_30j': ('date de mise en place', -30, None),
+    'reevaluations_30j': ('date de derniere reevaluation', -30, None),
+    'engagements_echus': ('date de maturite de l engagement', None, -1),
+}
+
+
+# Nombre de jours d'observation passés (date « au » du tableau de bord)
+# gardés en mémoire par Jeu, en plus du jour courant
+JOURS_EN_CACHE = 8
+
+
+def aujourd_hui():
+    return pd.Timestamp.today().normalize()
+
+
+def jour_reference(valeur=None):
+    # Date choisie dans le tableau de bord (chaîne ISO du DatePicker), minuit ;
+    # aujourd'hui si aucune date n'est choisie
+    if not valeur:
+        return aujourd_hui()
+    return pd.Timestamp(valeur).normalize()
+
+
+def bornes(nom, jour):
+    colonne, debut, fin = FENETRES[nom]
+    return (colonne,
+            None if debut is None else jour + pd.Timedelta(days=debut),
+            None if fin is None else jour + pd.Timedelta(days=fin))
+
+
+class Precalculs:
+    # Lignes de chaque fenêtre pour le portefeuille non filtré, et leurs
+    # nombre et montant par assureur, plus les alertes relatives au jour.
+    # Calculé une fois par jour et par Jeu.
+    def __init__(self, jeu, jour):
+        debut = time.perf_counter()
+        self.jour = jour
+        self.version = jeu.version
+        self.lignes = {}
+        self.par_garant = {}
+        for nom in FENETRES:
+            colonne, debut_fenetre, fin_fenetre = bornes(nom, jour)
+            lignes = jeu.dates[colonne].fenetre(debut_fenetre, fin_fenetre)
+            self.lignes[nom] = lignes
+            self.par_garant[nom] = jeu.df.iloc[lignes].groupby('nom garant', observed=True).agg(
+                nb=('nom garant', 'size'), montant=('montant de la garantie', 'sum'))
+        # Garanties actives arrivant à échéance sous 3 mois dont le client n'a
+        # pas encore de garantie plus récente
+        echeances = self.lignes['echeances_3mois']
+        actives = echeances[(jeu.df['situationde la garantie'].iloc[echeances] == 'Active').to_numpy()]
+        self.alertes = {'en_renouvellement': actives[~jeu.clients.renouvelees(actives)]}
+        logger.info("Indicateurs du %s précalculés (v%d) en %.3fs",
+                    jour.date(), jeu.version, time.perf_counter() - debut)
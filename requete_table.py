@@ -0,0 +1,69 @@
+import re
+
+import pandas as pd
+
+# Opérateurs du filter_query de DataTable, écrits en symbole ou en mot, et leur
+# nom (méthode pandas pour les comparaisons)
+OPERATEURS_FILTRE = {'>=': 'ge', '<=': 'le', '!=': 'ne', '<': 'lt', '>': 'gt', '=': 'eq',
+                     'ge': 'ge', 'le': 'le', 'ne': 'ne', 'lt': 'lt', 'gt': 'gt', 'eq': 'eq',
+                     'contains': 'contains', 'datestartswith': 'datestartswith'}
+
+# "{Colonne} op valeur", lu par position : l'opérateur est le seul jeton qui
+# suit l'accolade fermante, tout le reste est la valeur (qui peut contenir
+# "le ", "<"...). DataTable préfixe l'opérateur de la casse : s (sensible,
+# "scontains", "s>") ou i (insensible, "icontains", "i=") ; sans préfixe la
+# comparaison est sensible. Les symboles les plus longs sont essayés d'abord ;
+# un mot doit être suivi d'un espace.
+_CLAUSE = re.compile(
+    r'\s*\{(?P<nom>[^}]*)\}\s*(?P<casse>[si])?'
+    r'(?:(?P<symbole>>=|<=|!=|<|>|=)\s*|(?P<mot>ge|le|ne|lt|gt|eq|contains|datestartswith)\s+)'
+    r'(?P<valeur>.*?)\s*')
+
+
+def decouper_filtre(partie):
+    # Une clause -> (colonne, op, valeur, sensible à la casse) ; que des None
+    # si elle ne suit pas la syntaxe
+    clause = _CLAUSE.fullmatch(partie)
+    if clause is None or not clause['valeur']:
+        return None, None, None, None
+    valeur = clause['valeur']
+    if len(valeur) >= 2 and valeur[0] == valeur[-1] and valeur[0] in ("'", '"', '`'):
+        valeur = valeur[1:-1].replace('\\' + valeur[0], valeur[0])
+    else:
+        try:
+            valeur = float(valeur)
+        except ValueError:
+            pass
+    return clause['nom'], OPERATEURS_FILTRE[clause['symbole'] or clause['mot']], valeur, clause['casse'] != 'i'
+
+
+def filtrer(df, filter_query, colonnes_dates=()):
+    # Applique un filter_query de DataTable ("clause && clause") à df ; les
+    # clauses illisibles ou sur une colonne inconnue sont ignorées. Les
+    # colonnes de colonnes_dates sont comparées en dates (jj/mm/aaaa).
+    for partie in (filter_query or '').split(' && '):
+        nom, operateur, valeur, sensible = decouper_filtre(partie)
+        if nom not in df.columns:
+            continue
+        colonne = df[nom]
+        if isinstance(colonne.dtype, pd.CategoricalDtype):
+            colonne = colonne.astype(str)
+        if nom in colonnes_dates:
+            if operateur == 'contains':
+                colonne = colonne.dt.strftime('%d/%m/%Y')
+            elif operateur == 'datestartswith':
+                colonne = colonne.dt.strftime('%Y-%m-%d')
+            else:
+                valeur = pd.to_datetime(str(valeur), dayfirst=True, errors='coerce')
+                if pd.isnull(valeur):
+                    continue
+        if operateur in ('eq', 'ne', 'lt', 'le', 'gt', 'ge'):
+            if not sensible and isinstance(valeur, str) and not pd.api.types.is_numeric_dtype(colonne.dtype):
+                colonne, valeur = colonne.astype(str).str.casefold(), valeur.casefold()
+            masque = getattr(colonne, operateur)(valeur)
+        elif operateur == 'contains':
+            masque = colonne.astype(str).str.contains(str(valeur), case=sensible, regex=False)
+        else:
+            masque = colonne.astype(str).str.startswith(str(valeur))
+        df = df.loc[masque]
+    return df
@@ -0,0 +1,206 @@
+import logging
+from dataclasses import dataclass
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Formats de date acceptés, essayés dans l'ordre : celui des extraits
+# (jour/mois/année) d'abord, puis l'ISO. Pas d'inférence : une cellule qui ne
+# correspond à aucun format est rejetée et signalée.
+FORMATS_DATE = ('%d/%m/%Y', '%Y-%m-%d', '%d/%m/%Y %H:%M:%S', '%Y-%m-%d %H:%M:%S')
+
+SITUATIONS_GARANTIE = ('Active', 'Expirée', 'Résiliée')
+
+
+@dataclass(frozen=True)
+class Colonne:
+    # Une colonne de l'extrait délégation : type ('texte', 'date' ou
+    # 'montant'), présence obligatoire, valeurs admises (texte) et formats
+    # (date)
+    nom: str
+    type: str = 'texte'
+    obligatoire: bool = True
+    valeurs: tuple = ()
+    formats: tuple = FORMATS_DATE
+
+
+SCHEMA = (
+    Colonne('code client'),
+    Colonne('nom client'),
+    Colonne('libelle nature'),
+    Colonne('nom garant'),
+    Colonne('libelle segment'),
+    Colonne('situationde la garantie', valeurs=SITUATIONS_GARANTIE),
+    Colonne('montant de la garantie', 'montant'),
+    Colonne('montant engagement couvert actualisé', 'montant'),
+    Colonne('date de mise en place', 'date'),
+    Colonne('date d echeance', 'date'),
+    Colonne('date de saisie', 'date'),
+    Colonne('date de derniere reevaluation', 'date'),
+    Colonne('date de maturite de l engagement', 'date'),
+    Colonne('situation de l engagement', obligatoire=False),
+)
+
+
+def colonnes(type_colonne):
+    return [colonne.nom for colonne in SCHEMA if colonne.type == type_colonne]
+
+
+class Rapport:
+    # Cellules rejetées ou corrigées pendant le typage d'un extrait : numéro
+    # de ligne (comme dans le fichier, en-tête en ligne 1), colonne, valeur
+    # d'origine et motif. Alimenté bloc par bloc en lecture en flux.
+    COLONNES = ['ligne', 'colonne', 'valeur', 'motif']
+
+    def __init__(self):
+        self.lignes = 0
+        self._blocs = []
+
+    def ajouter(self, positions, colonne, valeurs, motif):
+        if len(positions):
+            self._blocs.append(pd.DataFrame({
+                'ligne': np.asarray(positions) + self.lignes + 2,
+                'colonne': colonne,
+                'valeur': pd.Series(valeurs, dtype=object).astype(str).to_numpy(),
+                'motif': motif,
+            }))
+
+    def rejets(self):
+        if not self._blocs:
+            return pd.DataFrame(columns=self.COLONNES)
+        return pd.concat(self._blocs, ignore_index=True)
+
+    def resume(self):
+        # {colonne: {motif: nombre}}
+        resume = {}
+        for bloc in self._blocs:
+            for (colonne, motif), nombre in bloc.groupby(['colonne', 'motif']).size().items():
+                par_motif = resume.setdefault(colonne, {})
+                par_motif[motif] = par_motif.get(motif, 0) + int(nombre)
+        return resume
+
+    def journaliser(self, source):
+        resume = self.resume()
+        total = sum(n for par_motif in resume.values() for n in par_motif.values())
+        if total:
+            logger.warning("%s : %d cellule(s) rejetée(s) ou corrigée(s) sur %d lignes (%s)", source, total,
+                           self.lignes, '; '.join(f"{colonne} : {motif} {n}" for colonne, par_motif in resume.items()
+                                                  for motif, n in par_motif.items()))
+
+    def ecrire(self, chemin):
+        self.rejets().to_csv(chemin, index=False, encoding='utf-8')
+
+
+def _dates(serie, formats):
+    # Chaque chaîne distincte n'est analysée qu'une fois (une date revient sur
+    # des centaines de lignes) avec des formats explicites, puis le résultat
+    # est redistribué par codes. Les dates déjà typées (cellules Excel au
+    # format date) passent telles quelles.
+    if pd.api.types.is_datetime64_any_dtype(serie.dtype):
+        return serie.astype('datetime64[ns]').to_numpy(), np.zeros(len(serie), dtype=bool)
+    codes, uniques = pd.factorize(serie)
+    if not len(uniques):
+        # Colonne entièrement vide
+        return np.full(len(serie), np.datetime64('NaT'), dtype='datetime64[ns]'), np.zeros(len(serie), dtype=bool)
+    uniques = pd.Series(uniques, dtype=object)
+    resultat = pd.Series(pd.NaT, index=uniques.index, dtype='datetime64[ns]')
+
+    natives = uniques.map(lambda v: isinstance(v, date)).to_numpy(dtype=bool)
+    if natives.any():
+        resultat[natives] = pd.to_datetime(uniques[natives]).astype('datetime64[ns]')
+    textes = uniques[~natives].astype(str).str.strip()
+    for format_date in formats:
+        restants = resultat[~natives].isna().to_numpy()
+        if not restants.any():
+            break
+        a_lire = textes[restants]
+        resultat[a_lire.index] = pd.to_datetime(a_lire, format=format_date, errors='coerce')
+
+    valeurs = resultat.to_numpy()
+    dates = np.where(codes >= 0, valeurs[np.maximum(codes, 0)], np.datetime64('NaT'))
+    # Cellule renseignée mais illisible
+    rejetees = (codes >= 0) & np.isnat(dates)
+    return dates.astype('datetime64[ns]'), rejetees
+
+
+def _montants(serie):
+    if pd.api.types.is_numeric_dtype(serie.dtype) and not pd.api.types.is_bool_dtype(serie.dtype):
+        return serie.astype('float64').to_numpy(), np.zeros(len(serie), dtype=bool)
+    valeurs = pd.to_numeric(serie, errors='coerce').astype('float64').to_numpy()
+    renseignees = serie.notna().to_numpy() & (serie.astype(str).str.strip() != '').to_numpy()
+    return valeurs, renseignees & np.isnan(valeurs)
+
+
+def _texte(valeur):
+    # Code lu comme nombre par le lecteur Excel : 12.0 -> '12'
+    if isinstance(valeur, float) and valeur.is_integer():
+        return str(int(valeur))
+    return str(valeur)
+
+
+def _en_texte(serie):
+    # Colonne texte -> chaînes (manquantes conservées), quel que soit le type
+    # deviné à la lecture : un code client tout numérique dans un bloc reste
+    # comparable aux codes alphanumériques des autres. Une conversion par
+    # valeur distincte. Seule une colonne déjà en chaînes est gardée telle
+    # quelle : une colonne vide lue en float64 devient une colonne de None.
+    deja_texte = serie.dtype == object or isinstance(serie.dtype, pd.StringDtype)
+    if deja_texte and pd.api.types.infer_dtype(serie, skipna=True) in ('string', 'empty'):
+        return serie
+    codes, uniques = pd.factorize(serie)
+    textes = np.array([_texte(v) for v in uniques] + [None], dtype=object)
+    return pd.Series(textes[codes], index=serie.index, dtype=object)
+
+
+def _textes(serie, valeurs_admises):
+    # Valeurs admises reconnues sans tenir compte des espaces ni de la casse
+    # ("active " -> "Active") ; les autres sont gardées et signalées
+    textes = serie.where(serie.isna(), serie.astype(str).str.strip())
+    canoniques = {v.casefold(): v for v in valeurs_admises}
+    cles = textes.str.casefold()
+    corrigees = cles.map(canoniques)
+    inconnues = textes.notna() & corrigees.isna()
+    modifiees = corrigees.notna() & (corrigees != textes)
+    return textes.where(corrigees.isna(), corrigees), inconnues.to_numpy(), modifiees.to_numpy()
+
+
+def appliquer(df, rapport):
+    # Typage et validation de df (noms de colonnes déjà nettoyés) selon
+    # SCHEMA, en place ; les cellules rejetées ou corrigées vont au rapport
+    absentes = [c.nom for c in SCHEMA if c.obligatoire and c.nom not in df.columns]
+    if absentes:
+        raise ValueError(f"Colonnes absentes de l'extrait : {', '.join(absentes)}")
+
+    for colonne in SCHEMA:
+        if colonne.nom not in df.columns:
+            continue
+        serie = df[colonne.nom]
+        if colonne.type == 'date':
+            dates, rejetees = _dates(serie, colonne.formats)
+            rapport.ajouter(np.flatnonzero(rejetees), colonne.nom, serie.to_numpy()[rejetees], 'date illisible')
+            df[colonne.nom] = dates
+        elif colonne.type == 'montant':
+            montants, rejetes = _montants(serie)
+            rapport.ajouter(np.flatnonzero(rejetes), colonne.nom, serie.to_numpy()[rejetes], 'montant illisible')
+            negatifs = montants < 0
+            rapport.ajouter(np.flatnonzero(negatifs), colonne.nom, montants[negatifs], 'montant négatif')
+            df[colonne.nom] = montants
+        else:
+            serie = df[colonne.nom] = _en_texte(serie)
+        if colonne.valeurs:
+            textes, inconnues, corrigees = _textes(serie, colonne.valeurs)
+            rapport.ajouter(np.flatnonzero(inconnues), colonne.nom, serie.to_numpy()[inconnues], 'valeur inconnue')
+            rapport.ajouter(np.flatnonzero(corrigees), colonne.nom, serie.to_numpy()[corrigees], 'valeur normalisée')
+            df[colonne.nom] = textes
+
+    # Dates de fin antérieures à la mise en place : gardées, mais signalées
+    for colonne, motif in (('date d echeance', 'échéance avant la mise en place'),
+                           ('date de maturite de l engagement', 'maturité avant la mise en place')):
+        if colonne in df.columns and 'date de mise en place' in df.columns:
+            inversees = (df[colonne] < df['date de mise en place']).to_numpy()
+            rapport.ajouter(np.flatnonzero(inversees), colonne, df[colonne].to_numpy()[inversees], motif)
+    rapport.lignes += len(df)
+    return df
@@ -0,0 +1,172 @@
+import logging
+import os
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Callbacks d'arrière-plan : les onglets lourds sont calculés dans un processus
+# fils lancé par le gestionnaire diskcache de Dash. Un calcul encore en cours
+# est tué quand l'utilisateur change de filtre (Dash envoie l'ancien job avec
+# la nouvelle requête) et les résultats sont mis en cache sur disque, partagés
+# entre workers.
+REPERTOIRE = os.environ.get('DASH_TACHES', 'data/.taches')
+
+# Nombre de calculs simultanés par session de navigateur
+LIMITE_SESSION = int(os.environ.get('DASH_TACHES_PAR_SESSION', 2))
+
+# Durée de vie des résultats en cache (la date du jour fait partie de la clé)
+EXPIRATION = 24 * 3600
+
+# Durée pendant laquelle un résultat partagé reste lisible par les calculs
+# identiques qui l'attendaient (le cache durable est celui de Dash, cache_by)
+EXPIRATION_PARTAGE = 60
+
+# Attente maximale d'un créneau de session ou d'un calcul partagé (secondes)
+ATTENTE_MAX = float(os.environ.get('DASH_TACHES_ATTENTE', 120))
+
+# Un créneau tenu plus longtemps est considéré abandonné (processus bloqué)
+DUREE_MAX_CRENEAU = float(os.environ.get('DASH_TACHES_DUREE_MAX', 900))
+
+_ABSENT = object()
+
+
+class _Echec:
+    # Erreur du meneur, gardée EXPIRATION_PARTAGE secondes sous la clé du
+    # résultat : les calculs identiques la relancent au lieu de refaire un
+    # calcul qui échouerait de la même façon
+    def __init__(self, erreur):
+        self.erreur = erreur
+
+
+class CreneauIndisponible(TimeoutError):
+    pass
+
+
+def creer_gestionnaire(*cache_by):
+    # None si diskcache (ou multiprocess / psutil) n'est pas installé : les
+    # callbacks restent alors synchrones
+    try:
+        import diskcache
+        import multiprocess  # noqa: F401
+        import psutil  # noqa: F401
+        from dash import DiskcacheManager
+    except ImportError:
+        logger.warning("diskcache absent : callbacks d'onglets synchrones")
+        return None
+    cache = diskcache.Cache(REPERTOIRE)
+    return DiskcacheManager(cache, cache_by=list(cache_by), expire=EXPIRATION)
+
+
+def _jeton():
+    # Identité du processus courant : pid et date de création. Un pid réutilisé
+    # par un autre processus n'a pas la même date de création.
+    import psutil
+
+    return os.getpid(), psutil.Process().create_time()
+
+
+def _vivant(jeton):
+    import psutil
+
+    pid, creation = jeton
+    try:
+        processus = psutil.Process(pid)
+        return processus.create_time() == creation and processus.status() != psutil.STATUS_ZOMBIE
+    except psutil.NoSuchProcess:
+        return False
+
+
+def _reserver(cache, cle, jeton):
+    # Les processus tués par Dash (annulation) ne libèrent pas leur créneau :
+    # on ne compte que les créneaux de processus encore vivants, pris depuis
+    # moins de DUREE_MAX_CRENEAU.
+    maintenant = time.time()
+    with cache.transact():
+        actifs = [(j, debut) for j, debut in cache.get(cle, ())
+                  if maintenant - debut < DUREE_MAX_CRENEAU and _vivant(j)]
+        if len(actifs) >= LIMITE_SESSION:
+            cache.set(cle, actifs, expire=EXPIRATION)
+            return False
+        cache.set(cle, actifs + [(jeton, maintenant)], expire=EXPIRATION)
+        return True
+
+
+def _liberer(cache, cle, jeton):
+    with cache.transact():
+        cache.set(cle, [(j, debut) for j, debut in cache.get(cle, ()) if j != jeton], expire=EXPIRATION)
+
+
+@contextmanager
+def creneau(gestionnaire, session, en_attente=None):
+    # Limite le nombre de calculs simultanés d'une session : le calcul attend
+    # qu'un créneau se libère (en_attente() est appelée pendant l'attente),
+    # au plus ATTENTE_MAX secondes, puis CreneauIndisponible est levée.
+    # L'appelant choisit quoi faire : avec cache_by, Dash garderait une
+    # erreur en cache pour tous les utilisateurs.
+    if gestionnaire is None or not session:
+        yield
+        return
+    cache, cle, jeton = gestionnaire.handle, ('creneaux-session', session), _jeton()
+    fin = time.monotonic() + ATTENTE_MAX
+    while not _reserver(cache, cle, jeton):
+        if time.monotonic() >= fin:
+            raise CreneauIndisponible(f"Session {session} : aucun créneau libre après {ATTENTE_MAX:.0f}s")
+        if en_attente is not None:
+            en_attente()
+        time.sleep(0.2)
+    try:
+        yield
+    finally:
+        _liberer(cache, cle, jeton)
+
+
+def une_fois(gestionnaire, cle, calcul, en_attente=None):
+    # Single-flight entre processus et workers : le premier calcul d'une clé
+    # s'inscrit dans le cache disque, les calculs identiques lancés pendant ce
+    # temps attendent et lisent son résultat (ou son erreur). Si le meneur est
+    # tué (annulation), le suivant reprend le calcul.
+    if gestionnaire is None:
+        return calcul()
+    cache, jeton = gestionnaire.handle, _jeton()
+    cle_resultat, cle_vol = ('rendu-partage',) + cle, ('meneur',) + cle
+    fin = time.monotonic() + ATTENTE_MAX
+    while True:
+        with cache.transact():
+            valeur = cache.get(cle_resultat, _ABSENT)
+            if isinstance(valeur, _Echec):
+                raise valeur.erreur
+            if valeur is not _ABSENT:
+                return valeur
+            meneur = cache.get(cle_vol)
+            if meneur is None or not _vivant(meneur):
+                cache.set(cle_vol, jeton, expire=EXPIRATION)
+                break
+        if time.monotonic() >= fin:
+            # Meneur vivant mais bloqué : calcul sans attendre plus
+            logger.warning("Calcul partagé %s toujours en cours après %.0fs, calcul indépendant", cle, ATTENTE_MAX)
+            return calcul()
+        if en_attente is not None:
+            en_attente()
+        time.sleep(0.1)
+
+    try:
+        try:
+            valeur = calcul()
+        except Exception as exc:
+            _partager_echec(cache, cle_resultat, exc)
+            raise
+        cache.set(cle_resultat, valeur, expire=EXPIRATION_PARTAGE)
+        return valeur
+    finally:
+        with cache.transact():
+            if cache.get(cle_vol) == jeton:
+                cache.delete(cle_vol)
+
+
+def _partager_echec(cache, cle_resultat, erreur):
+    # Une erreur qui ne passe pas par pickle est remplacée par sa description
+    try:
+        cache.set(cle_resultat, _Echec(erreur), expire=EXPIRATION_PARTAGE)
+    except Exception:
+        cache.set(cle_resultat, _Echec(RuntimeError(repr(erreur))), expire=EXPIRATION_PARTAGE)
@@ -0,0 +1,106 @@
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from cache_rendu import CacheRendu, normaliser_filtres, taille_rendu  # noqa: E402
+
+NB_THREADS = 20
+
+
+def en_parallele(fonction, nb=NB_THREADS):
+    # Lance nb appels simultanés (barrière) ; résultats et exceptions dans
+    # l'ordre des threads
+    depart = threading.Barrier(nb)
+    resultats = [None] * nb
+
+    def appel(i):
+        depart.wait()
+        try:
+            resultats[i] = fonction()
+        except Exception as exc:
+            resultats[i] = exc
+
+    fils = [threading.Thread(target=appel, args=(i,)) for i in range(nb)]
+    for f in fils:
+        f.start()
+    for f in fils:
+        f.join()
+    return resultats
+
+
+class Calcul:
+    # Calcul lent qui compte ses exécutions
+    def __init__(self, duree=0.2, erreur=None):
+        self.duree = duree
+        self.erreur = erreur
+        self.appels = 0
+        self._verrou = threading.Lock()
+
+    def __call__(self):
+        with self._verrou:
+            self.appels += 1
+        time.sleep(self.duree)
+        if self.erreur is not None:
+            raise self.erreur
+        return {'figure': list(range(100))}
+
+
+def test_un_seul_calcul_par_cle():
+    cache = CacheRendu()
+    calcul = Calcul()
+    resultats = en_parallele(lambda: cache.obtenir(('onglet', ()), calcul))
+
+    assert calcul.appels == 1
+    assert all(r == {'figure': list(range(100))} for r in resultats)
+    stats = cache.stats()
+    assert stats['misses'] == 1
+    assert stats['partages'] + stats['hits'] == NB_THREADS - 1
+    assert stats['entrees'] == 1 and stats['taille'] == taille_rendu(resultats[0])
+
+    # Servi depuis le cache ensuite, sans nouveau calcul
+    assert cache.obtenir(('onglet', ()), calcul) == resultats[0]
+    assert calcul.appels == 1
+
+
+def test_echec_partage_et_non_garde():
+    cache = CacheRendu()
+    calcul = Calcul(erreur=ValueError("extrait illisible"))
+    resultats = en_parallele(lambda: cache.obtenir(('onglet', ()), calcul))
+
+    assert calcul.appels == 1
+    assert all(isinstance(r, ValueError) for r in resultats)
+    assert cache.stats()['entrees'] == 0
+
+    # L'échec n'est pas mis en cache : la demande suivante recalcule
+    calcul.erreur = None
+    assert cache.obtenir(('onglet', ()), calcul) == {'figure': list(range(100))}
+    assert calcul.appels == 2
+
+
+def test_cles_distinctes_independantes():
+    cache = CacheRendu()
+    calculs = [Calcul(duree=0.05) for _ in range(4)]
+    compteur = iter(range(NB_THREADS))
+    verrou = threading.Lock()
+
+    def demande():
+        with verrou:
+            i = next(compteur) % len(calculs)
+        return cache.obtenir(('onglet', i), calculs[i])
+
+    en_parallele(demande)
+    assert [c.appels for c in calculs] == [1, 1, 1, 1]
+    assert cache.stats()['misses'] == 4
+
+
+@pytest.mark.parametrize('filtres, attendu', [
+    ((['b', 'a'], None, []), (('a', 'b'), (), ())),
+    ((['a', 'a'], [2024], None), (('a',), (2024,), ())),
+])
+def test_normaliser_filtres(filtres, attendu):
+    assert normaliser_filtres(*filtres) == attendu
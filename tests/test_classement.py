@@ -0,0 +1,77 @@
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'bench'))
+
+from classement import Classement  # noqa: E402
+from donnees import preparer  # noqa: E402
+from generer import generer  # noqa: E402
+from index_clients import IndexClients  # noqa: E402
+
+AN = pd.Timestamp.today().year
+
+# Sans filtre, une dimension (tranches CSR) et plusieurs (cellules)
+FILTRES = [
+    (None, None, None),
+    (['Nature 1'], None, None),
+    (None, ['Garant 2', 'Garant 7'], None),
+    (None, None, [AN - 1, AN - 4]),
+    (['Nature 1', 'Nature 4'], ['Garant 2', 'Garant 3'], None),
+    (['Nature 2'], ['Garant 5'], [AN - 2]),
+    (None, ['Garant inconnu'], None),
+]
+
+
+@pytest.fixture(scope='module')
+def portefeuille():
+    # Peu de clients : beaucoup d'égalités sur le nombre de garanties
+    df = preparer(generer(5_000, nb_clients=400, manquants=0.05))
+    return df, Classement(df, IndexClients(df))
+
+
+def top_groupby(df, mesure, n, filtres):
+    type_filter, assur_filter, year_filter = filtres
+    masque = pd.Series(True, index=df.index)
+    if type_filter:
+        masque &= df['libelle nature'].isin(type_filter)
+    if assur_filter:
+        masque &= df['nom garant'].isin(assur_filter)
+    if year_filter:
+        masque &= df['date de mise en place'].dt.year.isin(year_filter)
+    dff = df[masque & df['code client'].notna()]
+    par_client = dff.groupby(dff['code client'].astype(str)).agg(
+        nb=('code client', 'size'), montant=('montant de la garantie', 'sum'),
+        nom=('nom client', 'first')).reset_index()
+    # Décroissant, puis par code client à valeur égale
+    return par_client.sort_values([mesure, 'code client'], ascending=[False, True], kind='stable').head(n)
+
+
+@pytest.mark.parametrize('filtres', FILTRES)
+@pytest.mark.parametrize('mesure', ['nb', 'montant'])
+@pytest.mark.parametrize('n', [10, 50, 1_000])
+def test_top(portefeuille, filtres, mesure, n):
+    df, classement = portefeuille
+    top = classement.top(mesure, n, *filtres)
+    attendu = top_groupby(df, mesure, n, filtres)
+
+    assert top['code client'].tolist() == attendu['code client'].tolist()
+    assert top['nom client'].astype(str).tolist() == attendu['nom'].astype(str).tolist()
+    if mesure == 'nb':
+        assert top['nb'].tolist() == attendu['nb'].tolist()
+    else:
+        assert top['montant'].tolist() == pytest.approx(attendu['montant'].tolist(), rel=1e-9)
+
+
+@pytest.mark.parametrize('filtres', FILTRES)
+def test_agregats(portefeuille, filtres):
+    df, classement = portefeuille
+    agregats = classement.agregats(*filtres)
+    attendu = top_groupby(df, 'nb', len(df), filtres).set_index('code client')
+    presents = agregats['nb'] > 0
+    assert dict(zip(classement.codes[presents], agregats['nb'][presents])) == attendu['nb'].to_dict()
+    assert dict(zip(classement.codes[presents], agregats['montant'][presents])) == pytest.approx(
+        attendu['montant'].to_dict(), rel=1e-9)
@@ -0,0 +1,131 @@
+import dataclasses
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'bench'))
+
+import kpi  # noqa: E402
+import precalcul  # noqa: E402
+from cube import LIBELLES_TRANCHES, TRANCHES  # noqa: E402
+from donnees import Jeu, preparer  # noqa: E402
+from generer import generer  # noqa: E402
+
+AN = pd.Timestamp.today().year
+
+FILTRES = [
+    (None, None, None),
+    (['Nature 1'], None, None),
+    (None, ['Garant 2', 'Garant 7'], None),
+    (None, None, [AN - 2, AN - 5]),
+    (['Nature 1', 'Nature 4'], ['Garant 2', 'Garant 3'], [AN - 1]),
+    (['Nature inconnue'], None, None),
+]
+
+JOURS = [None, precalcul.aujourd_hui() - pd.Timedelta(days=400), pd.Timestamp(AN - 3, 6, 15)]
+
+
+@pytest.fixture(scope='module')
+def jeu():
+    return Jeu(preparer(generer(5_000, manquants=0.05)), 1, 'generer')
+
+
+def lignes_pandas(df, filtres):
+    type_filter, assur_filter, year_filter = filtres
+    masque = pd.Series(True, index=df.index)
+    if type_filter:
+        masque &= df['libelle nature'].isin(type_filter)
+    if assur_filter:
+        masque &= df['nom garant'].isin(assur_filter)
+    if year_filter:
+        masque &= df['date de mise en place'].dt.year.isin(year_filter)
+    return df[masque]
+
+
+def masque_fenetre(dff, nom, jour):
+    colonne, debut, fin = precalcul.bornes(nom, jour)
+    masque = dff[colonne].notna()
+    if debut is not None:
+        masque &= dff[colonne] >= debut
+    if fin is not None:
+        masque &= dff[colonne] <= fin
+    return masque
+
+
+def dans_fenetre(dff, nom, jour):
+    return int(masque_fenetre(dff, nom, jour).sum())
+
+
+def indicateurs_pandas(dff, jour):
+    situation = dff['situationde la garantie']
+    return {
+        'clients': dff['code client'].nunique(),
+        'total': len(dff),
+        'actives': int((situation == 'Active').sum()),
+        'expirees': int((situation == 'Expirée').sum()),
+        'resiliees': int((situation == 'Résiliée').sum()),
+        'mt_total': dff['montant de la garantie'].sum(),
+        'mt_moyen': dff['montant de la garantie'].mean(),
+        'eng_total': dff['montant engagement couvert actualisé'].sum(),
+        'echeances_3mois': dans_fenetre(dff, 'echeances_3mois', jour),
+        'renouvellements_30j': dans_fenetre(dff, 'renouvellements_30j', jour),
+        'duree_moyenne': dff['duree_garantie'].astype('float64').mean(),
+        'delai_moyen': (dff['date de mise en place'] - dff['date de saisie']).dt.days.mean(),
+    }
+
+
+@pytest.mark.parametrize('filtres', FILTRES)
+@pytest.mark.parametrize('jour', JOURS)
+def test_indicateurs(jeu, filtres, jour):
+    sel = jeu.selection(*filtres, jour=jour)
+    dff = lignes_pandas(jeu.df, filtres)
+    attendu = indicateurs_pandas(dff, sel.jour)
+
+    assert sel.dff.index.equals(dff.index)
+    assert sel.nb_lignes == len(dff)
+    for indicateurs in (kpi.depuis_selection(sel), kpi.calculer(sel.dff, sel.jour)):
+        assert dataclasses.asdict(indicateurs) == pytest.approx(attendu, rel=1e-9, nan_ok=True)
+
+
+@pytest.mark.parametrize('filtres', FILTRES)
+@pytest.mark.parametrize('jour', JOURS)
+def test_fenetres(jeu, filtres, jour):
+    sel = jeu.selection(*filtres, jour=jour)
+    dff = lignes_pandas(jeu.df, filtres)
+    for nom in precalcul.FENETRES:
+        attendu = dff[masque_fenetre(dff, nom, sel.jour)]
+        assert sel.compter_fenetre(nom) == len(attendu)
+        assert sel.lignes_fenetre(nom).index.equals(attendu.index)
+        par_garant = sel.par_garant_fenetre(nom)
+        par_garant = par_garant[par_garant['nb'] > 0]
+        assert dict(zip(par_garant.index.astype(str), par_garant['nb'])) == \
+            attendu['nom garant'].astype(str).value_counts().to_dict()
+
+
+def _dimensions(dff):
+    return {
+        'libelle segment': dff['libelle segment'],
+        'situationde la garantie': dff['situationde la garantie'],
+        'nom garant': dff['nom garant'],
+        'mois mise en place': dff['date de mise en place'].dt.to_period('M'),
+        'mois echeance': dff['date d echeance'].dt.to_period('M'),
+        'tranche': pd.cut(dff['montant de la garantie'], bins=TRANCHES, labels=LIBELLES_TRANCHES),
+    }
+
+
+@pytest.mark.parametrize('filtres', FILTRES)
+def test_repartitions(jeu, filtres):
+    vue = jeu.selection(*filtres).vue
+    dff = lignes_pandas(jeu.df, filtres)
+    for dimension, serie in _dimensions(dff).items():
+        par = vue.par(dimension)
+        par = par[par['nb'] > 0]
+        attendu = dff.groupby(serie, observed=True)['montant de la garantie'].agg(['size', 'sum'])
+        attendu = attendu[attendu['size'] > 0]
+        assert dict(zip(par[dimension].astype(str), par['nb'])) == dict(
+            zip(attendu.index.astype(str), attendu['size']))
+        assert dict(zip(par[dimension].astype(str), par['mt_somme'])) == pytest.approx(
+            dict(zip(attendu.index.astype(str), attendu['sum'])), rel=1e-9)
@@ -0,0 +1,48 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'bench'))
+
+from donnees import preparer  # noqa: E402
+from generer import generer  # noqa: E402
+from index_clients import IndexClients  # noqa: E402
+
+
+def renouvelees_naif(df, lignes):
+    # Jointure du portefeuille sur lui-même par client : une ligne est
+    # renouvelée si une autre garantie du client est mise en place après
+    # elle (toute comparaison avec NaT est fausse)
+    interrogees = df.iloc[lignes][['code client', 'date de mise en place']].reset_index(drop=True)
+    paires = interrogees.reset_index().merge(df[['code client', 'date de mise en place']],
+                                             on='code client', suffixes=('', '_autre'))
+    renouvelees = paires.loc[paires['date de mise en place_autre'] > paires['date de mise en place'], 'index']
+    return np.isin(np.arange(len(lignes)), renouvelees.to_numpy())
+
+
+def test_dates_manquantes():
+    df = pd.DataFrame({
+        'code client': ['A', 'A', 'A', 'B', 'B', 'C', None],
+        'date de mise en place': pd.to_datetime(['2024-01-01', None, '2024-06-01', None, None, '2024-03-01',
+                                                 '2024-01-01']),
+    })
+    clients = IndexClients(df)
+    lignes = np.arange(len(df))
+    # Une ligne sans date (A, B) ou sans client n'est jamais renouvelée
+    assert clients.renouvelees(lignes).tolist() == [True, False, False, False, False, False, False]
+    assert clients.renouvelees(lignes).tolist() == renouvelees_naif(df, lignes).tolist()
+
+
+@pytest.mark.parametrize('n, manquants', [(5_000, 0.01), (5_000, 0.2), (20_000, 0.05)])
+def test_renouvelees_comme_jointure(n, manquants):
+    df = preparer(generer(n, manquants=manquants)).reset_index(drop=True)
+    clients = IndexClients(df)
+    expirees = np.flatnonzero((df['situationde la garantie'] == 'Expirée').to_numpy())
+    assert df['date de mise en place'].iloc[expirees].isna().any()
+    assert np.array_equal(clients.renouvelees(expirees), renouvelees_naif(df, expirees))
+    lignes = np.arange(len(df))
+    assert np.array_equal(clients.renouvelees(lignes), renouvelees_naif(df, lignes))
@@ -0,0 +1,89 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'bench'))
+
+from donnees import preparer  # noqa: E402
+from generer import generer  # noqa: E402
+from index_intervalles import IndexIntervalles  # noqa: E402
+
+
+@pytest.fixture(scope='module')
+def portefeuille():
+    df = preparer(generer(5_000, manquants=0.05))
+    rng = np.random.default_rng(1)
+    # Montants manquants et périodes inversées (échéance avant la mise en place)
+    df.loc[rng.random(len(df)) < 0.03, 'montant de la garantie'] = np.nan
+    inversees = rng.random(len(df)) < 0.02
+    df.loc[inversees, 'date d echeance'] = df.loc[inversees, 'date de mise en place'] - pd.Timedelta(days=10)
+    return df
+
+
+def actives_brut(df, jour):
+    # Une garantie est active du jour de sa mise en place au jour de son
+    # échéance inclus ; sans l'une des deux dates elle ne l'est jamais
+    jour = pd.Timestamp(jour)
+    actives = (df['date de mise en place'] <= jour) & (df['date d echeance'] >= jour)
+    return int(actives.sum()), float(df.loc[actives, 'montant de la garantie'].fillna(0).sum())
+
+
+def jours_tests(df):
+    debut = df['date de mise en place'].min()
+    fin = df['date d echeance'].max()
+    jours = list(pd.date_range(debut - pd.Timedelta(days=1), fin + pd.Timedelta(days=1), periods=25))
+    # Bornes exactes : premier jour d'une garantie, dernier jour d'une autre,
+    # et une date avec heure
+    jours += [df['date de mise en place'].iloc[3], df['date d echeance'].iloc[7],
+              df['date d echeance'].iloc[7] + pd.Timedelta(hours=12)]
+    return jours
+
+
+def test_actives(portefeuille):
+    index = IndexIntervalles(portefeuille)
+    for jour in jours_tests(portefeuille):
+        nb, montant = index.actives(jour)
+        nb_attendu, montant_attendu = actives_brut(portefeuille, jour)
+        assert nb == nb_attendu
+        assert montant == pytest.approx(montant_attendu, rel=1e-9, abs=1e-3)
+
+
+def test_courbe(portefeuille):
+    index = IndexIntervalles(portefeuille)
+    debut = pd.Timestamp.today().normalize() - pd.Timedelta(days=60)
+    courbe = index.courbe(debut, debut + pd.Timedelta(days=30))
+    assert len(courbe) == 31
+    for jour, nb, montant in courbe.itertuples(index=False):
+        nb_attendu, montant_attendu = actives_brut(portefeuille, jour)
+        assert nb == nb_attendu
+        assert montant == pytest.approx(montant_attendu, rel=1e-9, abs=1e-3)
+
+
+@pytest.mark.parametrize('colonne, valeurs', [
+    ('nom garant', ['Garant 1']),
+    ('libelle nature', ['Nature 2', 'Nature 5']),
+    ('libelle nature', ['Nature inconnue']),
+])
+def test_restreindre(portefeuille, colonne, valeurs):
+    masque = portefeuille[colonne].isin(valeurs).to_numpy()
+    index = IndexIntervalles(portefeuille).restreindre(masque)
+    filtre = portefeuille[masque]
+    for jour in jours_tests(portefeuille):
+        nb, montant = index.actives(jour)
+        nb_attendu, montant_attendu = actives_brut(filtre, jour)
+        assert nb == nb_attendu
+        assert montant == pytest.approx(montant_attendu, rel=1e-9, abs=1e-3)
+
+
+def test_vide():
+    df = pd.DataFrame({'date de mise en place': pd.to_datetime([None, '2024-05-01']),
+                       'date d echeance': pd.to_datetime(['2024-12-31', '2024-01-01']),
+                       'montant de la garantie': [100.0, 200.0]})
+    index = IndexIntervalles(df)
+    assert len(index) == 0
+    assert index.actives('2024-06-01') == (0, 0.0)
+    assert index.courbe().empty
@@ -0,0 +1,72 @@
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from requete_table import decouper_filtre, filtrer  # noqa: E402
+
+
+@pytest.mark.parametrize('partie, attendu', [
+    ('{Client} contains "Nicole Dupont"', ('Client', 'contains', 'Nicole Dupont', True)),
+    ('{Client} contains "Générale Assurances"', ('Client', 'contains', 'Générale Assurances', True)),
+    ('{Client} contains "Caisse <Nord>"', ('Client', 'contains', 'Caisse <Nord>', True)),
+    ('{Client} = "Lt Ge eq ne"', ('Client', 'eq', 'Lt Ge eq ne', True)),
+    ('{Client} contains Marne', ('Client', 'contains', 'Marne', True)),
+    ('{Client} contains "Dit \\"le\\" Grand"', ('Client', 'contains', 'Dit "le" Grand', True)),
+    ('{Jours restants} >= 7', ('Jours restants', 'ge', 7.0, True)),
+    ('{Jours restants} < 15', ('Jours restants', 'lt', 15.0, True)),
+    ('{Jours restants} != 3', ('Jours restants', 'ne', 3.0, True)),
+    ('{Jours restants} le 30', ('Jours restants', 'le', 30.0, True)),
+    ('{Échéance} datestartswith 2025-03', ('Échéance', 'datestartswith', '2025-03', True)),
+    # Opérateurs tels que DataTable les envoie, préfixés de la casse
+    ('{Client} scontains Dupont', ('Client', 'contains', 'Dupont', True)),
+    ('{Client} icontains dup', ('Client', 'contains', 'dup', False)),
+    ('{Montant} s> 1000', ('Montant', 'gt', 1000.0, True)),
+    ('{Montant} s<= 1000', ('Montant', 'le', 1000.0, True)),
+    ('{Client} s= "Nicole Dupont"', ('Client', 'eq', 'Nicole Dupont', True)),
+    ('{Client} i= "nicole dupont"', ('Client', 'eq', 'nicole dupont', False)),
+    ('{Client} scontains "Générale le Assurances"', ('Client', 'contains', 'Générale le Assurances', True)),
+])
+def test_decouper_filtre(partie, attendu):
+    assert decouper_filtre(partie) == attendu
+
+
+@pytest.mark.parametrize('partie', [
+    '',
+    'Client contains Dupont',
+    '{Client} Dupont le Grand',
+    '{Client} contains',
+    '{Client} legal "x"',
+    '{Client} xcontains Dupont',
+])
+def test_clause_invalide(partie):
+    assert decouper_filtre(partie) == (None, None, None, None)
+
+
+@pytest.fixture
+def echeances():
+    return pd.DataFrame({
+        'Client': ['Nicole Dupont', 'Jean DUPONT', 'Caisse <Nord>', 'Générale Assurances'],
+        'Montant': [500.0, 1500.0, 2500.0, 1000.0],
+        'Échéance': pd.to_datetime(['2025-03-01', '2025-03-15', '2025-04-02', '2025-05-20']),
+    })
+
+
+@pytest.mark.parametrize('requete, clients', [
+    ('{Client} scontains Dupont', ['Nicole Dupont']),
+    ('{Client} icontains dup', ['Nicole Dupont', 'Jean DUPONT']),
+    ('{Montant} s> 1000', ['Jean DUPONT', 'Caisse <Nord>']),
+    ('{Montant} s>= 1000 && {Client} icontains e', ['Jean DUPONT', 'Caisse <Nord>', 'Générale Assurances']),
+    ('{Client} i= "jean dupont"', ['Jean DUPONT']),
+    ('{Client} s= "jean dupont"', []),
+    ('{Client} scontains "Caisse <Nord>"', ['Caisse <Nord>']),
+    ('{Client} scontains "Générale Assurances"', ['Générale Assurances']),
+    ('{Échéance} datestartswith 2025-03', ['Nicole Dupont', 'Jean DUPONT']),
+    ('{Échéance} s< 01/04/2025', ['Nicole Dupont', 'Jean DUPONT']),
+    ('{Inconnue} scontains x', ['Nicole Dupont', 'Jean DUPONT', 'Caisse <Nord>', 'Générale Assurances']),
+])
+def test_filtrer(echeances, requete, clients):
+    assert filtrer(echeances, requete, ['Échéance'])['Client'].tolist() == clients
@@ -0,0 +1,62 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'bench'))
+
+import schema  # noqa: E402
+from donnees import typer  # noqa: E402
+from generer import generer  # noqa: E402
+
+
+def _est_texte(serie):
+    return serie.dtype == object or isinstance(serie.dtype, pd.StringDtype)
+
+
+SERIES_VIDES = {
+    'float64': pd.Series([np.nan, np.nan]),
+    'float64 sans ligne': pd.Series([], dtype='float64'),
+    'Int64': pd.Series([pd.NA, pd.NA], dtype='Int64'),
+    'datetime': pd.Series([pd.NaT, pd.NaT]),
+    'object': pd.Series([np.nan, None], dtype=object),
+    'string': pd.Series([pd.NA, pd.NA], dtype='string'),
+}
+
+
+@pytest.mark.parametrize('serie', SERIES_VIDES.values(), ids=SERIES_VIDES.keys())
+def test_colonne_vide_en_texte(serie):
+    textes = schema._en_texte(serie)
+    assert _est_texte(textes)
+    assert textes.isna().all()
+    corrigees, inconnues, modifiees = schema._textes(textes, schema.SITUATIONS_GARANTIE)
+    assert corrigees.isna().all() and not inconnues.any() and not modifiees.any()
+
+
+def test_colonne_vide_quel_que_soit_infer_dtype(monkeypatch):
+    # Selon la version de pandas, une colonne float64 toute vide est vue
+    # comme 'empty' : elle doit quand même devenir du texte
+    monkeypatch.setattr(pd.api.types, 'infer_dtype', lambda *args, **kwargs: 'empty')
+    assert schema._en_texte(pd.Series([np.nan, np.nan])).dtype == object
+
+
+def test_codes_numeriques_en_texte():
+    textes = schema._en_texte(pd.Series([1234.0, np.nan, 56]))
+    assert textes.tolist() == ['1234', None, '56']
+
+
+def test_schema_ingestion_colonne_texte_vide():
+    pa = pytest.importorskip('pyarrow')
+    from ingestion import _schema
+
+    brut = generer(50)
+    brut['situationde la garantie'] = np.nan
+    brut['nom client'] = np.nan
+    bloc = typer(brut)
+    assert _est_texte(bloc['situationde la garantie']) and _est_texte(bloc['nom client'])
+    champs = _schema(bloc)
+    assert champs.field('situationde la garantie').type == pa.string()
+    assert champs.field('nom client').type == pa.string()